@@ -1,14 +1,27 @@
-from flask import Flask, render_template, request, jsonify, session, Response, redirect, url_for, flash
-from clinical_ai import init_clinical_ai, get_clinical_ai, clinical_kb
+from flask import Flask, render_template, request, jsonify, session, Response, redirect, url_for, flash, stream_with_context, g
+from clinical_ai import init_clinical_ai, get_clinical_ai, get_startup_report, clinical_kb
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 import os
 import json
 import io
 import csv
 import logging
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 import uuid
 import random
+import hashlib
+import hmac
+import secrets
+import zlib
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -19,8 +32,144 @@ app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'dev-secret-key-ch
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///bloom.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Generated question cache: variant lifetime and variants kept per prompt (0 disables)
+app.config['QUESTION_CACHE_TTL_HOURS'] = float(os.environ.get('QUESTION_CACHE_TTL_HOURS', 24))
+app.config['QUESTION_CACHE_VARIANTS'] = int(os.environ.get('QUESTION_CACHE_VARIANTS', 3))
+
+# Concurrent question generation: per-call timeout in seconds and thread pool size
+app.config['QUESTION_LLM_TIMEOUT'] = float(os.environ.get('QUESTION_LLM_TIMEOUT', 20))
+app.config['QUESTION_LLM_WORKERS'] = int(os.environ.get('QUESTION_LLM_WORKERS', 8))
+
+# Response analysis: 'combined' (one structured LLM call) or 'separate' (analysis + recommendations calls)
+app.config['ANALYSIS_MODE'] = os.environ.get('ANALYSIS_MODE', 'combined').lower()
+
+# Submission pipeline: 'sync' (analyze before responding) or 'queue' (persist, analyze in background)
+app.config['SUBMIT_MODE'] = os.environ.get('SUBMIT_MODE', 'sync').lower()
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('ANALYSIS_WORKERS', 2))
+app.config['ANALYSIS_STALE_MINUTES'] = int(os.environ.get('ANALYSIS_STALE_MINUTES', 10))
+
+# Company analytics: closed days are read from CompanyMetrics rollups
+app.config['METRICS_ROLLUP_INTERVAL'] = int(os.environ.get('METRICS_ROLLUP_INTERVAL', 300))  # seconds, 0 disables
+
+# Response storage: 'json' reads the JSON columns, 'normalized' reads the child tables
+# (child tables are always written; run `flask backfill-response-tables` before switching)
+app.config['RESPONSE_STORAGE'] = os.environ.get('RESPONSE_STORAGE', 'json').lower()
+
+# Company exports: departments with fewer participants than this are left out, as are
+# department-days with fewer responses (k-anonymity threshold)
+app.config['EXPORT_MIN_GROUP_SIZE'] = int(os.environ.get('EXPORT_MIN_GROUP_SIZE', 5))
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection"""
+
+    SLOW_CHECKOUT_MS = 50
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkout_stats = {
+            'checkouts': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'slow_checkouts': 0,  # waited longer than SLOW_CHECKOUT_MS
+            'timeouts': 0
+        }
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                stats = self.checkout_stats
+                stats['checkouts'] += 1
+                stats['total_wait_ms'] += waited_ms
+                stats['max_wait_ms'] = max(stats['max_wait_ms'], waited_ms)
+                if waited_ms > self.SLOW_CHECKOUT_MS:
+                    stats['slow_checkouts'] += 1
+                if timed_out:
+                    stats['timeouts'] += 1
+
+def database_engine_options(url):
+    """Engine options for the database profile matching a connection URL"""
+    if not url.startswith('postgresql'):
+        return {}
+
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'connect_args': {
+            'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))}"
+        }
+    }
+
+# SQLite performance mode for single-node installs: WAL journaling and a busy timeout on every connection
+app.config['SQLITE_PERFORMANCE_MODE'] = os.environ.get('SQLITE_PERFORMANCE_MODE', 'true').lower() == 'true'
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+# Minimum seconds between last_active writes for a user
+app.config['LAST_ACTIVE_DEBOUNCE_SECONDS'] = int(os.environ.get('LAST_ACTIVE_DEBOUNCE_SECONDS', 300))
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Let SQLite readers and writers overlap instead of failing with 'database is locked'"""
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not app.config['SQLITE_PERFORMANCE_MODE']:
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}")
+    cursor.close()
+
+# Database profile: pooling for Postgres, optional read replica for analytics and exports
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_BINDS'] = {}
+if os.environ.get('DATABASE_REPLICA_URL'):
+    replica_url = os.environ['DATABASE_REPLICA_URL']
+    app.config['SQLALCHEMY_BINDS']['replica'] = dict(database_engine_options(replica_url), url=replica_url)
+
 db = SQLAlchemy(app)
 
+def read_session():
+    """Session for analytics and export reads: the replica if configured, else the primary"""
+    if 'replica' not in app.config['SQLALCHEMY_BINDS']:
+        return db.session
+    if 'read_session' not in g:
+        g.read_session = Session(bind=db.engines['replica'])
+    return g.read_session
+
+@app.teardown_appcontext
+def close_read_session(exception=None):
+    read = g.pop('read_session', None)
+    if read is not None:
+        read.close()
+
+def database_pool_stats():
+    """Pool status and checkout wait metrics for each engine"""
+    pools = {}
+    for name, engine in db.engines.items():
+        pool = engine.pool
+        info = {'status': pool.status()}
+        stats = getattr(pool, 'checkout_stats', None)
+        if stats:
+            info.update(stats)
+            info['avg_wait_ms'] = round(stats['total_wait_ms'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+            info['checked_out'] = pool.checkedout()
+            info['overflow'] = pool.overflow()
+        pools[name or 'primary'] = info
+    return pools
+
 # Initialize clinical AI system
 print("🌟 Initializing clinical AI system...")
 try:
@@ -46,6 +195,11 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_active = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Check-in streak, maintained at submit time
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_check_in_date = db.Column(db.Date, nullable=True)
+
     # Relationships
     responses = db.relationship('DailyResponse', backref='user', lazy=True, cascade='all, delete-orphan')
 
@@ -68,20 +222,30 @@ class DailyResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
 
-    # Raw questionnaire data
-    questions = db.Column(db.Text, nullable=False)  # JSON string of questions asked
-    responses = db.Column(db.Text, nullable=False)  # JSON string of user responses
+    # Raw questionnaire data (deferred 'payload' group: loaded together on first access)
+    questions = db.deferred(db.Column(db.Text, nullable=False), group='payload')  # JSON string of questions asked
+    responses = db.deferred(db.Column(db.Text, nullable=False), group='payload')  # JSON string of user responses
 
     # AI analysis results
     burnout_score = db.Column(db.Float, nullable=True, index=True)
-    ai_analysis = db.Column(db.Text, nullable=True)  # JSON string of full AI analysis
+    ai_analysis = db.deferred(db.Column(db.Text, nullable=True), group='payload')  # JSON string of full AI analysis
     concerns = db.Column(db.Text, nullable=True)  # JSON array of identified concerns
     recommendations = db.Column(db.Text, nullable=True)  # JSON array of recommendations
     urgency_level = db.Column(db.String(20), nullable=True, index=True)  # low, medium, high
+    analysis_status = db.Column(db.String(20), nullable=False, default='complete', index=True)  # pending, processing, complete, failed
 
     # Metadata
     response_time_seconds = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    analyzed_at = db.Column(db.DateTime, nullable=True)
+
+    # Normalized copies of the JSON columns
+    items = db.relationship('ResponseItem', backref='response', lazy=True,
+                            cascade='all, delete-orphan', order_by='ResponseItem.position')
+    concern_rows = db.relationship('ResponseConcern', backref='response', lazy=True, cascade='all, delete-orphan')
+    recommendation_rows = db.relationship('ResponseRecommendation', backref='response', lazy=True,
+                                          cascade='all, delete-orphan', order_by='ResponseRecommendation.position')
+    category_scores = db.relationship('CategoryScore', backref='response', lazy=True, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Response {self.id} - Score: {self.burnout_score}>'
@@ -105,12 +269,117 @@ class DailyResponse(db.Model):
             'id': self.id,
             'burnout_score': self.burnout_score,
             'urgency_level': self.urgency_level,
-            'concerns': json.loads(self.concerns) if self.concerns else [],
-            'recommendations': json.loads(self.recommendations) if self.recommendations else [],
+            'concerns': response_concerns(self),
+            'recommendations': response_recommendations(self),
             'created_at': self.created_at.isoformat(),
-            'responses': self.get_responses_dict()
+            'responses': self.get_responses_dict(),
+            'analysis_status': self.analysis_status
         }
 
+class ResponseItem(db.Model):
+    """One answered question of a daily response"""
+    __tablename__ = 'response_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    category = db.Column(db.String(100), nullable=True, index=True)
+    question_type = db.Column(db.String(20), nullable=True)  # scale, text
+    question = db.Column(db.Text, nullable=True)
+    answer = db.Column(db.Text, nullable=True)
+    numeric_value = db.Column(db.Float, nullable=True)  # parsed answer for scale questions
+
+    def __repr__(self):
+        return f'<ResponseItem {self.response_id}:{self.position} {self.category}>'
+
+class ResponseConcern(db.Model):
+    """One concern identified in a daily response"""
+    __tablename__ = 'response_concerns'
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    concern = db.Column(db.String(255), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ResponseConcern {self.response_id} {self.concern}>'
+
+class ResponseRecommendation(db.Model):
+    """One recommendation given for a daily response"""
+    __tablename__ = 'response_recommendations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.Text, nullable=False)
+    rec_type = db.Column(db.String(50), nullable=True)
+    priority = db.Column(db.String(20), nullable=True)
+    evidence_based = db.Column(db.Boolean, default=False)
+    evidence_basis = db.Column(db.String(255), nullable=True)
+    rationale = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<ResponseRecommendation {self.response_id}:{self.position}>'
+
+class CategoryScore(db.Model):
+    """Scale answer value per question category, for progress metrics"""
+    __tablename__ = 'category_scores'
+    __table_args__ = (db.Index('ix_category_scores_user_category_created', 'user_id', 'category', 'created_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    category = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.Float, nullable=False)  # 1-10 scale answer as given
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CategoryScore {self.category}={self.value}>'
+
+class CompanyMetrics(db.Model):
+    """Aggregated company-level analytics (no individual data)"""
+    __tablename__ = 'company_metrics'
+    __table_args__ = (db.UniqueConstraint('company_id', 'date', name='uq_company_metrics_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.String(100), nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+
+    # Aggregated metrics
+    total_responses = db.Column(db.Integer, default=0)
+    avg_burnout_score = db.Column(db.Float, nullable=True)
+    high_risk_count = db.Column(db.Integer, default=0)
+    medium_risk_count = db.Column(db.Integer, default=0)
+    low_risk_count = db.Column(db.Integer, default=0)
+
+    # Department breakdown (JSON)
+    department_metrics = db.Column(db.Text, nullable=True)
+    common_concerns = db.Column(db.Text, nullable=True)  # JSON object of concern counts
+
+    # Highest response id included when this day was rolled up
+    last_response_id = db.Column(db.Integer, nullable=True)
+    # Highest response id that existed at that rollup; above last_response_id
+    # when analyses still pending held the day back
+    snapshot_id = db.Column(db.Integer, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Metrics {self.company_id} - {self.date}>'
+
+class GeneratedContent(db.Model):
+    """Cached LLM generations shared by users with the same prompt inputs"""
+    __tablename__ = 'generation_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), nullable=False, index=True)  # SHA-256 of prompt inputs
+    kind = db.Column(db.String(20), nullable=False)  # scale_questions, open_questions
+    content = db.Column(db.Text, nullable=False)  # JSON string of generated items
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<GeneratedContent {self.kind} {self.cache_key[:8]}...>'
+
 # ==================== BASIC ROUTES ====================
 
 @app.route('/')
@@ -171,6 +440,14 @@ def health():
         user_count = User.query.count()
         response_count = DailyResponse.query.count()
 
+        clinical_startup = get_startup_report()
+        if get_clinical_ai():
+            clinical_ai_state = 'available'
+        elif clinical_startup['state'] == 'loading':
+            clinical_ai_state = 'loading'
+        else:
+            clinical_ai_state = 'disabled'
+
         return jsonify({
             'status': 'healthy',
             'message': 'Bloom is running! 🌸',
@@ -186,8 +463,11 @@ def health():
                 'data_export': 'available',
                 'company_analytics': 'available',
                 'emergency_help': 'available',
-                'clinical_ai': 'available' if get_clinical_ai() else 'disabled'
-            }
+                'clinical_ai': clinical_ai_state
+            },
+            'database_pool': database_pool_stats(),
+            'clinical_ai_startup': clinical_startup,
+            'clinical_ai_cache': clinical_kb.cache_stats()
         })
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -219,6 +499,9 @@ def register():
         db.session.add(user)
         db.session.commit()
 
+        # New departments get their question-generation retrieval precomputed
+        register_question_templates([user.department])
+
         # Set session
         session['user_id'] = user.id
         session['company_id'] = user.company_id
@@ -294,9 +577,12 @@ def get_questions():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        # Update last active
-        user.last_active = datetime.utcnow()
-        db.session.commit()
+        # Update last active (debounced so page loads don't each take the write lock)
+        now = datetime.utcnow()
+        debounce = timedelta(seconds=app.config['LAST_ACTIVE_DEBOUNCE_SECONDS'])
+        if not user.last_active or now - user.last_active >= debounce:
+            user.last_active = now
+            db.session.commit()
 
         # Get clinical AI instance
         clinical_ai = get_clinical_ai()
@@ -323,11 +609,57 @@ def get_questions():
         logger.error(f"Question generation error: {str(e)}")
         return jsonify({'error': 'Failed to generate questions'}), 500
 
+# Guideline query prefix for each risk band used in question generation
+QUESTION_QUERY_BANDS = {
+    'high': "severe burnout assessment high risk clinical evaluation",
+    'moderate': "moderate burnout workplace stress assessment",
+    'low': "burnout prevention screening wellbeing assessment"
+}
+QUESTION_GUIDELINE_RESULTS = 3
+
+def question_score_band(avg_score):
+    """Map an average burnout score to a question-generation risk band"""
+    if avg_score > 70:
+        return 'high'
+    elif avg_score > 40:
+        return 'moderate'
+    else:
+        return 'low'
+
+def build_question_query(band, department):
+    """Build the guideline query for a risk band and department"""
+    query_parts = [QUESTION_QUERY_BANDS[band]]
+    if department:
+        query_parts.append(f"{department} workplace")
+    return " ".join(query_parts)
+
+def register_question_templates(departments):
+    """Precompute guideline retrieval for every risk band x department"""
+    departments = set(departments) | {None}
+    queries = [
+        build_question_query(band, department)
+        for band in QUESTION_QUERY_BANDS
+        for department in departments
+    ]
+    return clinical_kb.register_template_queries(queries, n_results=QUESTION_GUIDELINE_RESULTS)
+
+def warm_question_templates():
+    """Register question templates for all departments already in the database"""
+    try:
+        with app.app_context():
+            departments = [row[0] for row in db.session.query(User.department).distinct()]
+    except Exception as e:
+        # Tables may not exist yet on a fresh install; create_tables retries
+        logger.info(f"Question templates registered without departments ({e.__class__.__name__})")
+        departments = []
+
+    register_question_templates(departments)
+
 def generate_clinical_questions(user, clinical_ai):
     """Generate 5 questions: 3 open-ended + 2 scale questions based on clinical guidelines"""
 
     # Get user's recent responses for context
-    recent_responses = DailyResponse.query.filter_by(user_id=user.id) \
+    recent_responses = with_response_children(DailyResponse.query.filter_by(user_id=user.id)) \
         .order_by(DailyResponse.created_at.desc()) \
         .limit(3).all()
 
@@ -340,32 +672,16 @@ def generate_clinical_questions(user, clinical_ai):
             avg_score = sum(scores) / len(scores)
 
         for response in recent_responses:
-            if response.concerns:
-                try:
-                    concerns = json.loads(response.concerns)
-                    recent_concerns.extend(concerns)
-                except json.JSONDecodeError:
-                    pass
+            recent_concerns.extend(response_concerns(response))
 
     # Query clinical guidelines for relevant assessment tools
     kb = clinical_ai.kb
 
     # Build query based on user context
-    query_parts = []
-    if avg_score > 70:
-        query_parts.append("severe burnout assessment high risk clinical evaluation")
-    elif avg_score > 40:
-        query_parts.append("moderate burnout workplace stress assessment")
-    else:
-        query_parts.append("burnout prevention screening wellbeing assessment")
-
-    if user.department:
-        query_parts.append(f"{user.department} workplace")
+    query = build_question_query(question_score_band(avg_score), user.department)
 
-    query = " ".join(query_parts)
-
-    # Get relevant clinical guidelines
-    guidelines = kb.query_guidelines(query, n_results=3)
+    # Get relevant clinical guidelines (precomputed for every band and department)
+    guidelines = kb.query_guidelines(query, n_results=QUESTION_GUIDELINE_RESULTS)
 
     # Extract clinical context for question generation
     clinical_context = ""
@@ -373,14 +689,20 @@ def generate_clinical_questions(user, clinical_ai):
         clinical_context += f"{guideline['content'][:200]}... "
 
     questions = []
+    department = user.department
 
-    # Generate 2 SCALE questions using clinical AI
-    scale_questions = generate_ai_scale_questions(clinical_context, user, avg_score)
-    questions.extend(scale_questions)
+    # Generate 2 SCALE and 3 OPEN-ENDED questions concurrently, so page
+    # latency is the slower of the two LLM calls rather than their sum
+    started = time.monotonic()
+    scale_future = question_executor.submit(
+        run_in_app_context, generate_ai_scale_questions, clinical_context, department, avg_score
+    )
+    open_future = question_executor.submit(
+        run_in_app_context, generate_ai_open_questions, clinical_context, department, recent_concerns
+    )
 
-    # Generate 3 OPEN-ENDED questions using clinical AI
-    open_questions = generate_ai_open_questions(clinical_context, user, recent_concerns)
-    questions.extend(open_questions)
+    questions.extend(collect_generated_questions(scale_future, started, scale_question_fallback, 'scale'))
+    questions.extend(collect_generated_questions(open_future, started, open_question_fallback, 'open'))
 
     # Ensure we have exactly 5 questions and add sequential IDs
     questions = questions[:5]
@@ -389,7 +711,29 @@ def generate_clinical_questions(user, clinical_ai):
 
     return questions
 
-def generate_ai_scale_questions(clinical_context, user, avg_score):
+# Bounded pool for question-generation LLM calls
+question_executor = ThreadPoolExecutor(
+    max_workers=app.config['QUESTION_LLM_WORKERS'],
+    thread_name_prefix='question-llm'
+)
+
+def run_in_app_context(func, *args):
+    """Run a function from a worker thread inside its own application context"""
+    with app.app_context():
+        return func(*args)
+
+def collect_generated_questions(future, started, fallback, kind):
+    """Wait for a generation until its timeout, falling back to fixed questions"""
+    remaining = app.config['QUESTION_LLM_TIMEOUT'] - (time.monotonic() - started)
+    try:
+        return future.result(timeout=max(0, remaining))
+    except FutureTimeoutError:
+        logger.error(f"AI {kind} question generation timed out")
+    except Exception as e:
+        logger.error(f"AI {kind} question generation failed: {e}")
+    return fallback()
+
+def generate_ai_scale_questions(clinical_context, department, avg_score):
     """Generate 2 AI-powered scale questions based on clinical guidelines"""
 
     clinical_ai = get_clinical_ai()
@@ -412,6 +756,16 @@ def generate_ai_scale_questions(clinical_context, user, avg_score):
             }
         ]
 
+    cache_key = generation_cache_key(
+        'scale_questions',
+        clinical_context=clinical_context,
+        department=department,
+        score_band=question_score_band(avg_score)
+    )
+    cached_questions = get_cached_generation(cache_key)
+    if cached_questions is not None:
+        return cached_questions
+
     try:
         prompt = f"""
         Based on these clinical guidelines for workplace burnout assessment:
@@ -421,7 +775,7 @@ def generate_ai_scale_questions(clinical_context, user, avg_score):
         Generate exactly 2 scale-based questions (1-10 rating) for assessing workplace burnout and stress. 
         
         User context:
-        - Department: {user.department or 'General'}  
+        - Department: {department or 'General'}  
         - Current risk level: {'High' if avg_score > 70 else 'Moderate' if avg_score > 40 else 'Low'}
         
         Requirements:
@@ -451,33 +805,41 @@ def generate_ai_scale_questions(clinical_context, user, avg_score):
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=800
+            max_tokens=800,
+            timeout=app.config['QUESTION_LLM_TIMEOUT']
         )
 
         ai_response = json.loads(response.choices[0].message.content)
-        return ai_response.get('questions', [])[:2]  # Ensure exactly 2 questions
+        questions = ai_response.get('questions', [])[:2]  # Ensure exactly 2 questions
+
+        store_generation(cache_key, 'scale_questions', questions)
+        return questions
 
     except Exception as e:
         logger.error(f"AI scale question generation failed: {e}")
         # Return fallback questions
-        return [
-            {
-                'question': 'How emotionally drained do you feel from your work responsibilities?',
-                'type': 'scale',
-                'scale_label': '1 = Not drained at all, 10 = Completely exhausted',
-                'category': 'emotional_exhaustion',
-                'clinical_basis': 'MBI Emotional Exhaustion Scale'
-            },
-            {
-                'question': 'How often do you feel overwhelmed by your workload?',
-                'type': 'scale',
-                'scale_label': '1 = Never overwhelmed, 10 = Constantly overwhelmed',
-                'category': 'work_overload',
-                'clinical_basis': 'Job Demands-Resources Model'
-            }
-        ]
+        return scale_question_fallback()
+
+def scale_question_fallback():
+    """Scale questions used when AI generation fails or times out"""
+    return [
+        {
+            'question': 'How emotionally drained do you feel from your work responsibilities?',
+            'type': 'scale',
+            'scale_label': '1 = Not drained at all, 10 = Completely exhausted',
+            'category': 'emotional_exhaustion',
+            'clinical_basis': 'MBI Emotional Exhaustion Scale'
+        },
+        {
+            'question': 'How often do you feel overwhelmed by your workload?',
+            'type': 'scale',
+            'scale_label': '1 = Never overwhelmed, 10 = Constantly overwhelmed',
+            'category': 'work_overload',
+            'clinical_basis': 'Job Demands-Resources Model'
+        }
+    ]
 
-def generate_ai_open_questions(clinical_context, user, recent_concerns):
+def generate_ai_open_questions(clinical_context, department, recent_concerns):
     """Generate 3 AI-powered open-ended questions based on clinical guidelines"""
 
     clinical_ai = get_clinical_ai()
@@ -507,6 +869,16 @@ def generate_ai_open_questions(clinical_context, user, recent_concerns):
             }
         ]
 
+    cache_key = generation_cache_key(
+        'open_questions',
+        clinical_context=clinical_context,
+        department=department,
+        recent_concerns=normalize_concerns(recent_concerns[:3])
+    )
+    cached_questions = get_cached_generation(cache_key)
+    if cached_questions is not None:
+        return cached_questions
+
     try:
         concerns_context = f"Previous concerns: {', '.join(recent_concerns[:3])}" if recent_concerns else "No previous concerns noted"
 
@@ -518,7 +890,7 @@ def generate_ai_open_questions(clinical_context, user, recent_concerns):
         Generate exactly 3 open-ended questions for clinical assessment of workplace burnout and stress.
         
         User context:
-        - Department: {user.department or 'General'}
+        - Department: {department or 'General'}
         - {concerns_context}
         
         Requirements:
@@ -549,38 +921,111 @@ def generate_ai_open_questions(clinical_context, user, recent_concerns):
                 {"role": "user", "content": prompt}
             ],
             temperature=0.8,
-            max_tokens=1000
+            max_tokens=1000,
+            timeout=app.config['QUESTION_LLM_TIMEOUT']
         )
 
         ai_response = json.loads(response.choices[0].message.content)
-        return ai_response.get('questions', [])[:3]  # Ensure exactly 3 questions
+        questions = ai_response.get('questions', [])[:3]  # Ensure exactly 3 questions
+
+        store_generation(cache_key, 'open_questions', questions)
+        return questions
 
     except Exception as e:
         logger.error(f"AI open question generation failed: {e}")
         # Return fallback questions
-        return [
-            {
-                'question': 'Describe the most challenging aspects of your current work situation',
-                'type': 'text',
-                'placeholder': 'Share specific challenges, stressors, or difficult situations you are facing...',
-                'category': 'work_challenges',
-                'clinical_basis': 'Clinical Interview Assessment'
-            },
-            {
-                'question': 'How do you currently cope with work-related stress, and how effective are these strategies?',
-                'type': 'text',
-                'placeholder': 'Describe your coping methods and whether they help...',
-                'category': 'coping_strategies',
-                'clinical_basis': 'Coping Assessment'
-            },
-            {
-                'question': 'What kind of support or changes would be most helpful for improving your work experience?',
-                'type': 'text',
-                'placeholder': 'Describe what support, resources, or changes would help most...',
-                'category': 'support_preferences',
-                'clinical_basis': 'Intervention Preference Assessment'
-            }
-        ]
+        return open_question_fallback()
+
+def open_question_fallback():
+    """Open-ended questions used when AI generation fails or times out"""
+    return [
+        {
+            'question': 'Describe the most challenging aspects of your current work situation',
+            'type': 'text',
+            'placeholder': 'Share specific challenges, stressors, or difficult situations you are facing...',
+            'category': 'work_challenges',
+            'clinical_basis': 'Clinical Interview Assessment'
+        },
+        {
+            'question': 'How do you currently cope with work-related stress, and how effective are these strategies?',
+            'type': 'text',
+            'placeholder': 'Describe your coping methods and whether they help...',
+            'category': 'coping_strategies',
+            'clinical_basis': 'Coping Assessment'
+        },
+        {
+            'question': 'What kind of support or changes would be most helpful for improving your work experience?',
+            'type': 'text',
+            'placeholder': 'Describe what support, resources, or changes would help most...',
+            'category': 'support_preferences',
+            'clinical_basis': 'Intervention Preference Assessment'
+        }
+    ]
+
+# ==================== GENERATION CACHE ====================
+
+def generation_cache_key(kind, **inputs):
+    """Hash the inputs that determine an LLM prompt into a cache key"""
+    payload = json.dumps({'kind': kind, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def normalize_concerns(concerns):
+    """Order- and case-insensitive form of a concern list for cache keys"""
+    return sorted({str(concern).strip().lower() for concern in concerns if concern})
+
+def get_cached_generation(cache_key):
+    """Return a random cached variant once enough variants exist for this key
+
+    Until the per-key cap is reached callers keep generating, so the cached
+    pool holds several variants and questions still vary between check-ins.
+    """
+    max_variants = app.config['QUESTION_CACHE_VARIANTS']
+    if max_variants <= 0:
+        return None
+
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=app.config['QUESTION_CACHE_TTL_HOURS'])
+        variants = db.session.query(GeneratedContent.content).filter(
+            GeneratedContent.cache_key == cache_key,
+            GeneratedContent.created_at >= cutoff
+        ).all()
+
+        if len(variants) < max_variants:
+            return None
+
+        return json.loads(random.choice(variants)[0])
+
+    except Exception as e:
+        logger.warning(f"Generation cache lookup failed: {e}")
+        db.session.rollback()
+        return None
+
+def store_generation(cache_key, kind, items):
+    """Add a generated variant and trim expired or surplus variants for its key"""
+    max_variants = app.config['QUESTION_CACHE_VARIANTS']
+    if max_variants <= 0 or not items:
+        return
+
+    try:
+        db.session.add(GeneratedContent(cache_key=cache_key, kind=kind, content=json.dumps(items)))
+        db.session.flush()
+
+        cutoff = datetime.utcnow() - timedelta(hours=app.config['QUESTION_CACHE_TTL_HOURS'])
+        keep_ids = db.session.query(GeneratedContent.id).filter(
+            GeneratedContent.cache_key == cache_key,
+            GeneratedContent.created_at >= cutoff
+        ).order_by(GeneratedContent.created_at.desc()).limit(max_variants).subquery()
+
+        GeneratedContent.query.filter(
+            GeneratedContent.cache_key == cache_key,
+            GeneratedContent.id.notin_(db.select(keep_ids.c.id))
+        ).delete(synchronize_session=False)
+
+        db.session.commit()
+
+    except Exception as e:
+        logger.warning(f"Generation cache store failed: {e}")
+        db.session.rollback()
 
 # ==================== AI-POWERED RECOMMENDATIONS ====================
 
@@ -647,16 +1092,7 @@ def generate_personalized_ai_recommendations(user_responses, burnout_score, clin
         recommendations = ai_response.get('recommendations', [])
 
         # Format for app
-        formatted_recommendations = []
-        for i, rec in enumerate(recommendations[:3]):
-            formatted_recommendations.append({
-                'action': f"{rec['action']} {rec['implementation']}",
-                'rationale': rec.get('rationale', ''),
-                'type': 'personalized_ai',
-                'priority': 'high' if i == 0 else 'medium',
-                'evidence_based': True,
-                'evidence_basis': rec.get('evidence_basis', 'Clinical guidelines')
-            })
+        formatted_recommendations = format_ai_recommendations(recommendations)
 
         logger.info(f"Generated {len(formatted_recommendations)} personalized AI recommendations")
         return formatted_recommendations
@@ -665,6 +1101,20 @@ def generate_personalized_ai_recommendations(user_responses, burnout_score, clin
         logger.error(f"AI recommendation generation failed: {e}")
         return get_smart_fallback_recommendations(user_responses, burnout_score)
 
+def format_ai_recommendations(recommendations):
+    """Convert LLM recommendation objects into the app's recommendation format"""
+    formatted_recommendations = []
+    for i, rec in enumerate(recommendations[:3]):
+        formatted_recommendations.append({
+            'action': f"{rec['action']} {rec.get('implementation', '')}".strip(),
+            'rationale': rec.get('rationale', ''),
+            'type': 'personalized_ai',
+            'priority': 'high' if i == 0 else 'medium',
+            'evidence_based': True,
+            'evidence_basis': rec.get('evidence_basis', 'Clinical guidelines')
+        })
+    return formatted_recommendations
+
 def get_smart_fallback_recommendations(user_responses, burnout_score):
     """Generate smart fallback recommendations based on user responses when AI fails"""
     recommendations = []
@@ -754,14 +1204,26 @@ def analyze_responses(questions, responses):
             # Calculate basic burnout score for clinical context
             burnout_score = calculate_basic_burnout_score(questions, responses)
 
-            # Get clinical context for AI recommendation generation
+            # Retrieve clinical context once for both analysis and recommendations
             clinical_context = clinical_ai.kb.get_clinical_context(user_responses, burnout_score)
 
-            # Generate personalized AI recommendations based on user's specific answers
-            ai_recommendations = generate_personalized_ai_recommendations(user_responses, burnout_score, clinical_context)
+            if app.config['ANALYSIS_MODE'] == 'separate':
+                # Generate personalized AI recommendations based on user's specific answers
+                ai_recommendations = generate_personalized_ai_recommendations(user_responses, burnout_score, clinical_context)
+
+                # Get clinical analysis
+                clinical_analysis = clinical_ai.generate_clinical_analysis(user_responses, burnout_score, clinical_context)
+            else:
+                # One structured request returns analysis, risk factors and recommendations
+                clinical_analysis = clinical_ai.generate_combined_analysis(user_responses, burnout_score, clinical_context)
+                try:
+                    ai_recommendations = format_ai_recommendations(clinical_analysis.get('recommendations', []))
+                except (KeyError, TypeError) as e:
+                    logger.error(f"AI recommendation formatting failed: {e}")
+                    ai_recommendations = []
 
-            # Get clinical analysis
-            clinical_analysis = clinical_ai.generate_clinical_analysis(user_responses, burnout_score)
+                if not ai_recommendations:
+                    ai_recommendations = get_smart_fallback_recommendations(user_responses, burnout_score)
 
             # Convert clinical analysis to app format using AI-generated recommendations
             analysis = {
@@ -838,12 +1300,15 @@ def extract_concerns_from_clinical(clinical_analysis):
     """Extract concerns from clinical analysis"""
     concerns = []
 
-    structured = clinical_analysis.get('structured', {})
-    if structured.get('risk_factors'):
-        concerns.extend(structured['risk_factors'])
+    # A string here would otherwise be extended one character at a time
+    structured = clinical_analysis.get('structured')
+    risk_factors = structured.get('risk_factors') if isinstance(structured, dict) else None
+    if isinstance(risk_factors, list):
+        concerns.extend(factor for factor in risk_factors if isinstance(factor, str) and factor.strip())
 
     # Look for clinical indicators in analysis text
-    analysis_text = clinical_analysis.get('analysis', '').lower()
+    analysis_text = clinical_analysis.get('analysis')
+    analysis_text = analysis_text.lower() if isinstance(analysis_text, str) else ''
     if 'high risk' in analysis_text:
         concerns.append('High burnout risk identified by clinical assessment')
     if 'professional help' in analysis_text:
@@ -908,6 +1373,9 @@ def submit_responses():
         if not questions or not responses:
             return jsonify({'error': 'Questions and responses are required'}), 400
 
+        if app.config['SUBMIT_MODE'] == 'queue':
+            return queue_submission(user_id, questions, responses, response_time)
+
         # Analyze responses using clinical AI with personalized recommendations
         analysis = analyze_responses(questions, responses)
 
@@ -923,6 +1391,8 @@ def submit_responses():
             urgency_level=analysis['urgency'],
             response_time_seconds=response_time
         )
+        store_response_children(daily_response, questions, responses, analysis)
+        record_check_in(user_id)
 
         db.session.add(daily_response)
         db.session.commit()
@@ -940,6 +1410,728 @@ def submit_responses():
         db.session.rollback()
         return jsonify({'error': 'Failed to submit response'}), 500
 
+# ==================== NORMALIZED RESPONSE STORAGE ====================
+
+def store_response_children(daily_response, questions=None, responses=None, analysis=None):
+    """Write the normalized child rows next to the JSON columns"""
+    if questions is not None:
+        responses = responses if isinstance(responses, list) else []
+        items = []
+        category_scores = []
+        for i, question in enumerate(questions):
+            answer = responses[i] if i < len(responses) else None
+            numeric_value = None
+            if question.get('type') == 'scale':
+                try:
+                    numeric_value = float(answer)
+                except (TypeError, ValueError):
+                    pass
+            items.append(ResponseItem(
+                position=i,
+                category=question.get('category'),
+                question_type=question.get('type'),
+                question=question.get('question'),
+                answer=str(answer) if answer is not None else None,
+                numeric_value=numeric_value
+            ))
+            if numeric_value is not None and question.get('category'):
+                category_scores.append(CategoryScore(
+                    user_id=daily_response.user_id,
+                    category=question['category'],
+                    value=numeric_value,
+                    created_at=daily_response.created_at or datetime.utcnow()
+                ))
+        daily_response.items = items
+        daily_response.category_scores = category_scores
+
+    if analysis is not None:
+        concerns = []
+        for concern in analysis.get('concerns', []):
+            concern = str(concern)[:255]
+            if concern not in concerns:
+                concerns.append(concern)
+        daily_response.concern_rows = [ResponseConcern(concern=concern) for concern in concerns]
+
+        daily_response.recommendation_rows = [
+            ResponseRecommendation(
+                position=i,
+                action=rec.get('action', ''),
+                rec_type=rec.get('type'),
+                priority=rec.get('priority'),
+                evidence_based=bool(rec.get('evidence_based')),
+                evidence_basis=rec.get('evidence_basis'),
+                rationale=rec.get('rationale')
+            )
+            for i, rec in enumerate(analysis.get('recommendations', []))
+            if isinstance(rec, dict)
+        ]
+
+def response_concerns(response):
+    """Concerns of a response from the configured storage"""
+    if app.config['RESPONSE_STORAGE'] == 'normalized':
+        return [row.concern for row in response.concern_rows]
+    try:
+        return json.loads(response.concerns) if response.concerns else []
+    except json.JSONDecodeError:
+        return []
+
+def response_recommendations(response):
+    """Recommendations of a response from the configured storage"""
+    if app.config['RESPONSE_STORAGE'] == 'normalized':
+        recommendations = []
+        for row in response.recommendation_rows:
+            rec = {'action': row.action, 'type': row.rec_type, 'priority': row.priority,
+                   'evidence_based': row.evidence_based}
+            if row.evidence_basis:
+                rec['evidence_basis'] = row.evidence_basis
+            if row.rationale:
+                rec['rationale'] = row.rationale
+            recommendations.append(rec)
+        return recommendations
+    try:
+        return json.loads(response.recommendations) if response.recommendations else []
+    except json.JSONDecodeError:
+        return []
+
+def with_response_children(query):
+    """Load the rows response_concerns/recommendations read in one query per batch, not per response"""
+    if app.config['RESPONSE_STORAGE'] == 'normalized':
+        query = query.options(db.selectinload(DailyResponse.concern_rows),
+                              db.selectinload(DailyResponse.recommendation_rows))
+    return query
+
+def backfill_response_children(batch_size=500):
+    """Create child rows for responses stored before the normalized tables existed"""
+    migrated = 0
+    last_id = 0
+    while True:
+        # Replacing a lazy collection loads it first; fetch all four per batch
+        batch = DailyResponse.query \
+            .options(db.undefer_group('payload'),
+                     db.selectinload(DailyResponse.items),
+                     db.selectinload(DailyResponse.category_scores),
+                     db.selectinload(DailyResponse.concern_rows),
+                     db.selectinload(DailyResponse.recommendation_rows)) \
+            .filter(DailyResponse.id > last_id, ~DailyResponse.items.any()) \
+            .order_by(DailyResponse.id) \
+            .limit(batch_size).all()
+        if not batch:
+            return migrated
+
+        for daily_response in batch:
+            try:
+                questions = json.loads(daily_response.questions) if daily_response.questions else []
+                responses = json.loads(daily_response.responses) if daily_response.responses else []
+            except json.JSONDecodeError:
+                questions, responses = [], []
+
+            analysis = None
+            if daily_response.concerns is not None or daily_response.recommendations is not None:
+                analysis = {
+                    'concerns': parse_json_list(daily_response.concerns),
+                    'recommendations': parse_json_list(daily_response.recommendations)
+                }
+            store_response_children(daily_response, questions, responses, analysis)
+            migrated += 1
+
+        db.session.commit()
+        last_id = batch[-1].id
+
+def parse_json_list(value):
+    """Parse a JSON list column, tolerating bad data"""
+    try:
+        parsed = json.loads(value) if value else []
+    except json.JSONDecodeError:
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+def backfill_category_scores(batch_size=500):
+    """Create category score rows for responses stored before that table existed"""
+    migrated = 0
+    last_id = 0
+    while True:
+        batch = DailyResponse.query \
+            .options(db.undefer_group('payload'), db.selectinload(DailyResponse.category_scores)) \
+            .filter(DailyResponse.id > last_id, ~DailyResponse.category_scores.any()) \
+            .order_by(DailyResponse.id) \
+            .limit(batch_size).all()
+        if not batch:
+            return migrated
+
+        for daily_response in batch:
+            questions = parse_json_list(daily_response.questions)
+            responses = parse_json_list(daily_response.responses)
+            for i, question in enumerate(questions):
+                if not isinstance(question, dict) or question.get('type') != 'scale' or not question.get('category'):
+                    continue
+                try:
+                    value = float(responses[i])
+                except (IndexError, TypeError, ValueError):
+                    continue
+                daily_response.category_scores.append(CategoryScore(
+                    user_id=daily_response.user_id,
+                    category=question['category'],
+                    value=value,
+                    created_at=daily_response.created_at
+                ))
+                migrated += 1
+
+        db.session.commit()
+        last_id = batch[-1].id
+
+@app.cli.command('backfill-response-tables')
+def backfill_response_tables_command():
+    """Populate response_items, response_concerns and response_recommendations"""
+    started = time.time()
+    migrated = backfill_response_children()
+    scores = backfill_category_scores()
+    print(f"🗄️  Backfilled {migrated} responses and {scores} category scores in {time.time() - started:.2f}s")
+
+# ==================== COMPANY ANALYTICS ====================
+
+ANALYTICS_MAX_DAYS = 365
+TOP_CONCERNS_LIMIT = 5
+
+def parse_analytics_period(period):
+    """Convert a period such as '7d', '30d' or '90d' into a number of days"""
+    period = (period or '').lower().strip()
+    if period.endswith('d') and period[:-1].isdigit():
+        return max(1, min(int(period[:-1]), ANALYTICS_MAX_DAYS))
+    return 7
+
+def company_responses_query(company_id, since, *columns, session=None):
+    """Query columns of a company's responses since a point in time"""
+    query = (session or db.session).query(*columns) \
+        .select_from(DailyResponse) \
+        .join(User, User.id == DailyResponse.user_id) \
+        .filter(DailyResponse.created_at >= since,
+                DailyResponse.burnout_score.isnot(None))
+    if company_id:
+        query = query.filter(User.company_id == company_id)
+    return query
+
+def risk_count_columns():
+    """SQL aggregate columns counting responses per urgency level"""
+    return [
+        db.func.sum(db.case((DailyResponse.urgency_level == level, 1), else_=0))
+        for level in ('high', 'medium', 'low')
+    ]
+
+def wellness_score(avg_burnout):
+    """Wellness is shown to companies as the inverse of the burnout score"""
+    return round(100 - avg_burnout, 1) if avg_burnout is not None else 0.0
+
+def new_metrics_bucket():
+    """Empty accumulator for response counts, score sums and risk counts"""
+    return {'total': 0, 'score_sum': 0.0, 'high': 0, 'medium': 0, 'low': 0}
+
+def add_to_bucket(bucket, other):
+    """Add one accumulator into another"""
+    for key in ('total', 'score_sum', 'high', 'medium', 'low'):
+        bucket[key] += other[key]
+
+def uncovered_responses(query, day):
+    """Limit a response query to rows that no CompanyMetrics rollup includes
+
+    A rollup covers the responses of its company-day up to last_response_id;
+    days without a rollup (or with a legacy one lacking the id) are uncovered.
+    """
+    return query.outerjoin(CompanyMetrics, db.and_(
+        CompanyMetrics.company_id == User.company_id,
+        CompanyMetrics.date == day,
+        CompanyMetrics.last_response_id.isnot(None)
+    )).filter(db.or_(CompanyMetrics.id.is_(None), DailyResponse.id > CompanyMetrics.last_response_id))
+
+def uncovered_bound(company_id=None, since=None, session=None):
+    """Response id range holding every uncovered response, or None if nothing bounds them
+
+    Each rollup run covers every closed day up to its snapshot of the highest
+    response id, except past the watermark of days held back by pending
+    analyses. A response no run covers is therefore newer than the latest
+    snapshot, past a held-back watermark, or on a day after the newest
+    rollup; the lowest id of those three is a primary key range start.
+    """
+    session = session or db.session
+    snapshot_id, last_rolled_day, legacy_rows = session.query(
+        db.func.max(CompanyMetrics.snapshot_id),
+        db.func.max(CompanyMetrics.date),
+        db.func.sum(db.case((CompanyMetrics.last_response_id.is_(None), 1), else_=0))
+    ).one()
+    if snapshot_id is None or legacy_rows:
+        return None
+
+    held_back = session.query(db.func.min(CompanyMetrics.last_response_id)) \
+        .filter(CompanyMetrics.last_response_id < CompanyMetrics.snapshot_id)
+    if company_id:
+        held_back = held_back.filter(CompanyMetrics.company_id == company_id)
+    if since:
+        held_back = held_back.filter(CompanyMetrics.date >= since.date())
+    lowest_held_back = held_back.scalar()
+    lowest = snapshot_id if lowest_held_back is None else min(snapshot_id, lowest_held_back)
+
+    # Rows after the newest rolled-up day start at the first id on that day
+    after_last = datetime.combine(last_rolled_day + timedelta(days=1), datetime.min.time())
+    first_after = session.query(db.func.min(DailyResponse.id)) \
+        .filter(DailyResponse.created_at >= after_last).scalar()
+    if first_after is not None:
+        lowest = min(lowest, first_after - 1)
+    return DailyResponse.id > lowest
+
+def aggregate_responses(company_id=None, since=None, until=None, min_id=None, max_id=None, companies=None,
+                        uncovered=False, with_concerns=True, session=None):
+    """Aggregate responses into day buckets keyed by (company_id, date) in SQL
+
+    With uncovered=True only responses missing from the CompanyMetrics
+    rollups are counted, so the result adds onto bucket_from_metrics().
+    """
+    day = db.func.date(DailyResponse.created_at)
+    department = db.func.coalesce(User.department, 'unassigned')
+    bound = uncovered_bound(company_id, since, session=session) if uncovered else None
+
+    def scoped(*columns):
+        query = (session or db.session).query(*columns) \
+            .select_from(DailyResponse) \
+            .join(User, User.id == DailyResponse.user_id) \
+            .filter(DailyResponse.burnout_score.isnot(None))
+        if company_id:
+            query = query.filter(User.company_id == company_id)
+        if companies:
+            query = query.filter(User.company_id.in_(companies))
+        if since:
+            query = query.filter(DailyResponse.created_at >= since)
+        if until:
+            query = query.filter(DailyResponse.created_at < until)
+        if min_id is not None:
+            query = query.filter(DailyResponse.id > min_id)
+        if max_id is not None:
+            query = query.filter(DailyResponse.id <= max_id)
+        if uncovered:
+            query = uncovered_responses(query, day)
+        if bound is not None:
+            query = query.filter(bound)
+        return query
+
+    buckets = {}
+    rows = scoped(
+        User.company_id, day, department,
+        db.func.count(DailyResponse.id), db.func.sum(DailyResponse.burnout_score), *risk_count_columns()
+    ).group_by(User.company_id, day, department)
+
+    for company, date, dept, total, score_sum, high, medium, low in rows:
+        key = (company, str(date))
+        if key not in buckets:
+            buckets[key] = dict(new_metrics_bucket(), departments={}, concerns={})
+        counts = {'total': total, 'score_sum': score_sum or 0.0, 'high': high or 0, 'medium': medium or 0, 'low': low or 0}
+        add_to_bucket(buckets[key], counts)
+        buckets[key]['departments'][dept] = counts
+
+    if not with_concerns:
+        return buckets
+
+    if app.config['RESPONSE_STORAGE'] == 'normalized':
+        concern_counts = scoped(User.company_id, day, ResponseConcern.concern, db.func.count(ResponseConcern.id)) \
+            .join(ResponseConcern, ResponseConcern.response_id == DailyResponse.id) \
+            .group_by(User.company_id, day, ResponseConcern.concern)
+
+        for company, date, concern, count in concern_counts:
+            buckets[(company, str(date))]['concerns'][concern] = count
+        return buckets
+
+    # Concerns are stored as JSON text, so only that column is streamed back
+    concern_rows = scoped(User.company_id, day, DailyResponse.concerns) \
+        .filter(DailyResponse.concerns.isnot(None)) \
+        .execution_options(yield_per=1000)
+
+    for company, date, concerns_json in concern_rows:
+        try:
+            concerns = set(json.loads(concerns_json))
+        except (TypeError, json.JSONDecodeError):
+            continue
+        bucket_concerns = buckets[(company, str(date))]['concerns']
+        for concern in concerns:
+            bucket_concerns[concern] = bucket_concerns.get(concern, 0) + 1
+
+    return buckets
+
+def bucket_from_metrics(metrics):
+    """Rebuild a day bucket from a CompanyMetrics rollup row"""
+    total = metrics.total_responses or 0
+    bucket = {
+        'total': total,
+        'score_sum': (metrics.avg_burnout_score or 0.0) * total,
+        'high': metrics.high_risk_count or 0,
+        'medium': metrics.medium_risk_count or 0,
+        'low': metrics.low_risk_count or 0,
+        'departments': {},
+        'concerns': json.loads(metrics.common_concerns) if metrics.common_concerns else {}
+    }
+    departments = json.loads(metrics.department_metrics) if metrics.department_metrics else {}
+    for dept, values in departments.items():
+        bucket['departments'][dept] = {
+            'total': values['total'],
+            'score_sum': values['avg_burnout_score'] * values['total'],
+            'high': values['high_risk'],
+            'medium': values['medium_risk'],
+            'low': values['low_risk']
+        }
+    return bucket
+
+def apply_bucket_to_metrics(metrics, bucket, last_response_id, snapshot_id):
+    """Write a day bucket into a CompanyMetrics rollup row"""
+    metrics.total_responses = bucket['total']
+    metrics.avg_burnout_score = bucket['score_sum'] / bucket['total'] if bucket['total'] else None
+    metrics.high_risk_count = bucket['high']
+    metrics.medium_risk_count = bucket['medium']
+    metrics.low_risk_count = bucket['low']
+    metrics.department_metrics = json.dumps({
+        dept: {
+            'total': values['total'],
+            'avg_burnout_score': values['score_sum'] / values['total'] if values['total'] else 0.0,
+            'high_risk': values['high'],
+            'medium_risk': values['medium'],
+            'low_risk': values['low']
+        } for dept, values in bucket['departments'].items()
+    })
+    metrics.common_concerns = json.dumps(bucket['concerns'])
+    metrics.last_response_id = last_response_id
+    metrics.snapshot_id = snapshot_id
+
+def rollup_company_metrics():
+    """Upsert CompanyMetrics for closed days holding responses no rollup covers yet
+
+    Each day records the highest response id it includes in last_response_id.
+    A day with responses still pending or processing analysis is rolled up
+    only below the first of them; the rest of that day stays in the live part
+    of compute_company_analytics until a later run, without holding back any
+    other company or day.
+    """
+    today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    snapshot_id = db.session.query(db.func.max(DailyResponse.id)).scalar()
+    if not snapshot_id:
+        return 0
+
+    day = db.func.date(DailyResponse.created_at)
+
+    def closed_responses(*columns):
+        return db.session.query(*columns) \
+            .select_from(DailyResponse) \
+            .join(User, User.id == DailyResponse.user_id) \
+            .filter(DailyResponse.id <= snapshot_id, DailyResponse.created_at < today_start)
+
+    candidates = uncovered_responses(closed_responses(User.company_id, day), day)
+    bound = uncovered_bound()
+    if bound is not None:
+        candidates = candidates.filter(bound)
+
+    dirty = {(company, str(date)) for company, date in candidates.distinct()}
+    if not dirty:
+        return 0
+
+    dates = sorted(date for _, date in dirty)
+    since = datetime.strptime(dates[0], '%Y-%m-%d')
+    until = datetime.strptime(dates[-1], '%Y-%m-%d') + timedelta(days=1)
+    companies = sorted({company for company, _ in dirty})
+
+    # Rows waiting for analysis hold back only their own company-day
+    first_pending = {
+        (company, str(date)): first_id
+        for company, date, first_id in closed_responses(User.company_id, day, db.func.min(DailyResponse.id))
+        .filter(User.company_id.in_(companies),
+                DailyResponse.created_at >= since,
+                DailyResponse.created_at < until,
+                DailyResponse.analysis_status.in_(('pending', 'processing')))
+        .group_by(User.company_id, day)
+    }
+    watermarks = {key: first_pending[key] - 1 if key in first_pending else snapshot_id for key in dirty}
+
+    # Days sharing a watermark are aggregated in one pass; normally that is all of them
+    buckets = {}
+    for watermark in set(watermarks.values()):
+        keys = [key for key in dirty if watermarks[key] == watermark]
+        group_dates = sorted(date for _, date in keys)
+        group = aggregate_responses(
+            since=datetime.strptime(group_dates[0], '%Y-%m-%d'),
+            until=datetime.strptime(group_dates[-1], '%Y-%m-%d') + timedelta(days=1),
+            max_id=watermark,
+            companies=sorted({company for company, _ in keys})
+        )
+        buckets.update((key, bucket) for key, bucket in group.items() if watermarks.get(key) == watermark)
+
+    existing = {
+        (metrics.company_id, metrics.date.isoformat()): metrics
+        for metrics in CompanyMetrics.query.filter(
+            CompanyMetrics.company_id.in_(companies),
+            CompanyMetrics.date >= since.date(),
+            CompanyMetrics.date < until.date()
+        )
+    }
+
+    for key in dirty:
+        metrics = existing.get(key)
+        if metrics is None:
+            metrics = CompanyMetrics(company_id=key[0], date=datetime.strptime(key[1], '%Y-%m-%d').date())
+            db.session.add(metrics)
+        empty = dict(new_metrics_bucket(), departments={}, concerns={})
+        apply_bucket_to_metrics(metrics, buckets.get(key, empty), watermarks[key], snapshot_id)
+
+    db.session.commit()
+    return len(dirty)
+
+_rollup_state = {'last_run': 0.0}
+
+def maybe_rollup_company_metrics():
+    """Run the rollup from a request at most once per interval per process"""
+    interval = app.config['METRICS_ROLLUP_INTERVAL']
+    if interval <= 0 or time.time() - _rollup_state['last_run'] < interval:
+        return
+
+    _rollup_state['last_run'] = time.time()
+    try:
+        updated = rollup_company_metrics()
+        if updated:
+            logger.info(f"Rolled up company metrics for {updated} company-days")
+    except Exception as e:
+        # Another worker may have inserted the same day first; the next run catches up
+        logger.warning(f"Company metrics rollup skipped: {e}")
+        db.session.rollback()
+
+@app.cli.command('rollup-metrics')
+def rollup_metrics_command():
+    """Materialize CompanyMetrics rollups for closed days"""
+    started = time.time()
+    updated = rollup_company_metrics()
+    print(f"📊 Rolled up {updated} company-days in {time.time() - started:.2f}s")
+
+def compute_company_analytics(company_id, days):
+    """Merge CompanyMetrics rollups with live aggregates of everything they do not cover
+
+    Rolled-up days contribute their stored buckets plus any responses past
+    their last_response_id; days not rolled up yet (today, days closed since
+    the last run, or any day when rollups are disabled) are aggregated live.
+    uncovered_bound() keeps that live part to recent rows, so a long period
+    reads its rollup rows rather than every response in it.
+    """
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    since = datetime.combine(first_day, datetime.min.time())
+    reads = read_session()
+
+    day_buckets = []
+    rollups = reads.query(CompanyMetrics).filter(CompanyMetrics.date >= first_day,
+                                                 CompanyMetrics.last_response_id.isnot(None))
+    if company_id:
+        rollups = rollups.filter(CompanyMetrics.company_id == company_id)
+    for metrics in rollups:
+        day_buckets.append((metrics.date.isoformat(), bucket_from_metrics(metrics)))
+    for (_, date), bucket in aggregate_responses(company_id=company_id, since=since, uncovered=True,
+                                                 session=reads).items():
+        day_buckets.append((date, bucket))
+
+    overall = new_metrics_bucket()
+    departments = {}
+    days_seen = {}
+    concerns = {}
+    for date, bucket in day_buckets:
+        add_to_bucket(overall, bucket)
+        add_to_bucket(days_seen.setdefault(date, new_metrics_bucket()), bucket)
+        for dept, values in bucket['departments'].items():
+            add_to_bucket(departments.setdefault(dept, new_metrics_bucket()), values)
+        for concern, count in bucket['concerns'].items():
+            concerns[concern] = concerns.get(concern, 0) + count
+
+    # Headcount and participation come from the users table: the streak
+    # columns record each user's latest check-in day, so no response is read
+    users_query = reads.query(
+        db.func.count(User.id),
+        db.func.sum(db.case((User.last_check_in_date >= first_day, 1), else_=0))
+    )
+    if company_id:
+        users_query = users_query.filter(User.company_id == company_id)
+    total_users, active_users = users_query.one()
+    total_users = total_users or 0
+    active_users = active_users or 0
+
+    total_responses = overall['total']
+    top = sorted(concerns.items(), key=lambda item: (-item[1], item[0]))[:TOP_CONCERNS_LIMIT]
+
+    return {
+        'company_id': company_id,
+        'period_days': days,
+        'total_users': total_users,
+        'active_users': active_users,
+        'total_responses': total_responses,
+        'avg_wellness_score': bucket_wellness(overall),
+        'high_risk_count': overall['high'],
+        'medium_risk_count': overall['medium'],
+        'low_risk_count': overall['low'],
+        'participation_rate': round(active_users / total_users, 2) if total_users else 0.0,
+        'department_breakdown': [{
+            'department': dept.title(),
+            'avg_score': bucket_wellness(values),
+            'total': values['total'],
+            'high_risk': values['high'],
+            'medium_risk': values['medium']
+        } for dept, values in sorted(departments.items())],
+        'trend_data': [
+            {'date': date, 'avg_score': bucket_wellness(values)}
+            for date, values in sorted(days_seen.items())
+        ],
+        'top_concerns': [{
+            'name': name,
+            'count': count,
+            'percentage': round(count / total_responses * 100, 1) if total_responses else 0.0
+        } for name, count in top]
+    }
+
+def bucket_wellness(bucket):
+    """Wellness score of an accumulator"""
+    return wellness_score(bucket['score_sum'] / bucket['total'] if bucket['total'] else None)
+
+# ==================== BACKGROUND ANALYSIS ====================
+
+_analysis_pool = {'pid': None, 'executor': None}
+
+def get_analysis_executor():
+    """Per-process analysis worker pool, created after any gunicorn fork"""
+    if _analysis_pool['pid'] != os.getpid():
+        _analysis_pool['executor'] = ThreadPoolExecutor(
+            max_workers=app.config['ANALYSIS_WORKERS'],
+            thread_name_prefix='analysis'
+        )
+        _analysis_pool['pid'] = os.getpid()
+    return _analysis_pool['executor']
+
+@app.before_request
+def start_analysis_workers():
+    """On the first request in each process, pick up analyses left pending"""
+    if app.config['SUBMIT_MODE'] == 'queue' and _analysis_pool['pid'] != os.getpid():
+        get_analysis_executor().submit(run_in_app_context, recover_pending_analyses)
+
+def queue_submission(user_id, questions, responses, response_time):
+    """Persist raw responses with a basic score and analyze them in the background"""
+    burnout_score = calculate_basic_burnout_score(questions, responses)
+    urgency = determine_urgency(burnout_score)
+
+    daily_response = DailyResponse(
+        user_id=user_id,
+        questions=json.dumps(questions),
+        responses=json.dumps(responses),
+        burnout_score=burnout_score,
+        urgency_level=urgency,
+        analysis_status='pending',
+        response_time_seconds=response_time
+    )
+    store_response_children(daily_response, questions, responses)
+    record_check_in(user_id)
+
+    db.session.add(daily_response)
+    db.session.commit()
+
+    enqueue_analysis(daily_response.id)
+
+    logger.info(f"Queued analysis for user {user_id[:8]}... Response: {daily_response.id}, Score: {burnout_score:.1f}")
+
+    return jsonify({
+        'success': True,
+        'status': 'pending',
+        'response_id': daily_response.id,
+        'status_url': url_for('get_submission_status', response_id=daily_response.id),
+        'analysis': {
+            'score': burnout_score,
+            'urgency': urgency,
+            'concerns': [],
+            'recommendations': [],
+            'summary': 'Your responses are saved. Your personalized analysis is being prepared...',
+            'clinical_sources': [],
+            'confidence': 0.0
+        },
+        'message': 'Response submitted, analysis in progress'
+    }), 202
+
+def enqueue_analysis(response_id):
+    """Hand a pending response to the local analysis workers"""
+    get_analysis_executor().submit(run_in_app_context, process_pending_analysis, response_id)
+
+def process_pending_analysis(response_id):
+    """Claim a pending response and fill in its AI analysis"""
+    # Atomic claim so a response is analyzed once even if several processes see it
+    claimed = DailyResponse.query.filter_by(id=response_id, analysis_status='pending') \
+        .update({'analysis_status': 'processing', 'analyzed_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return
+
+    daily_response = db.session.get(DailyResponse, response_id)
+    try:
+        analysis = analyze_responses(json.loads(daily_response.questions), json.loads(daily_response.responses))
+
+        daily_response.burnout_score = analysis['score']
+        daily_response.ai_analysis = json.dumps(analysis)
+        daily_response.concerns = json.dumps(analysis['concerns'])
+        daily_response.recommendations = json.dumps(analysis['recommendations'])
+        daily_response.urgency_level = analysis['urgency']
+        store_response_children(daily_response, analysis=analysis)
+        daily_response.analysis_status = 'complete'
+        daily_response.analyzed_at = datetime.utcnow()
+        db.session.commit()
+
+        logger.info(f"Background analysis completed for response {response_id}, Score: {analysis['score']:.1f}")
+
+    except Exception as e:
+        logger.error(f"Background analysis failed for response {response_id}: {e}")
+        db.session.rollback()
+        DailyResponse.query.filter_by(id=response_id) \
+            .update({'analysis_status': 'failed'}, synchronize_session=False)
+        db.session.commit()
+
+def recover_pending_analyses():
+    """Re-queue pending responses and ones stuck in processing after a crash"""
+    try:
+        stale_before = datetime.utcnow() - timedelta(minutes=app.config['ANALYSIS_STALE_MINUTES'])
+        DailyResponse.query.filter(
+            DailyResponse.analysis_status == 'processing',
+            DailyResponse.analyzed_at < stale_before
+        ).update({'analysis_status': 'pending'}, synchronize_session=False)
+        db.session.commit()
+
+        pending_ids = [row[0] for row in db.session.query(DailyResponse.id)
+                       .filter(DailyResponse.analysis_status == 'pending')
+                       .order_by(DailyResponse.id)]
+        for response_id in pending_ids:
+            enqueue_analysis(response_id)
+
+        if pending_ids:
+            logger.info(f"Re-queued {len(pending_ids)} pending analyses")
+
+    except Exception as e:
+        logger.error(f"Pending analysis recovery failed: {e}")
+        db.session.rollback()
+
+@app.route('/api/submissions/<int:response_id>')
+def get_submission_status(response_id):
+    """Poll the analysis status of a submitted response"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'Authentication required'}), 401
+
+        daily_response = DailyResponse.query.filter_by(id=response_id, user_id=user_id).first()
+        if not daily_response:
+            return jsonify({'error': 'Response not found'}), 404
+
+        result = {
+            'response_id': daily_response.id,
+            'status': daily_response.analysis_status
+        }
+        if daily_response.analysis_status == 'complete':
+            result['analysis'] = daily_response.get_analysis_dict()
+
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Submission status error: {str(e)}")
+        return jsonify({'error': 'Failed to get submission status'}), 500
+
 # ==================== API ROUTES ====================
 
 @app.route('/api/user-data')
@@ -950,53 +2142,102 @@ def get_user_data():
         if not user_id:
             return jsonify({'error': 'Authentication required'}), 401
 
-        user = User.query.get(user_id)
-        if not user:
+        rows = dashboard_rows(user_id)
+        if not rows:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get recent responses (last 30 days)
-        recent_responses = DailyResponse.query.filter(
-            DailyResponse.user_id == user_id,
-            DailyResponse.created_at >= datetime.utcnow() - timedelta(days=30)
-        ).order_by(DailyResponse.created_at.desc()).limit(30).all()
-
-        # Calculate trends
-        scores = [r.burnout_score for r in recent_responses if r.burnout_score is not None]
-        trend = calculate_trend(scores)
-
-        # Get latest clinical analysis if available
-        latest_analysis = None
-        clinical_sources = []
-        if recent_responses:
-            latest_response = recent_responses[0]
-            analysis_data = latest_response.get_analysis_dict()
-            if analysis_data:
-                latest_analysis = analysis_data.get('analysis')
-                clinical_sources = analysis_data.get('clinical_sources', [])
-
-        return jsonify({
-            'user': {
-                'id': user.id,
-                'company_id': user.company_id,
-                'department': user.department,
-                'role_level': user.role_level,
-                'created_at': user.created_at.isoformat(),
-                'last_active': user.last_active.isoformat() if user.last_active else None
-            },
-            'recent_responses': [r.to_dict() for r in recent_responses],
-            'summary': {
-                'total_responses': len(recent_responses),
-                'average_score': sum(scores) / len(scores) if scores else 0,
-                'trend': trend,
-                'latest_analysis': latest_analysis,
-                'clinical_sources': clinical_sources
-            }
-        })
+        return jsonify(build_dashboard_payload(rows))
 
     except Exception as e:
         logger.error(f"User data error: {str(e)}")
         return jsonify({'error': 'Failed to get user data'}), 500
 
+DASHBOARD_DAYS = 30
+DASHBOARD_MAX_RESPONSES = 30
+
+def dashboard_rows(user_id):
+    """User columns, recent score rows and the latest analysis in one query"""
+    since = datetime.utcnow() - timedelta(days=DASHBOARD_DAYS)
+
+    # Only the newest response carries its (large) analysis text
+    latest_id = db.session.query(DailyResponse.id) \
+        .filter(DailyResponse.user_id == user_id) \
+        .order_by(DailyResponse.created_at.desc()) \
+        .limit(1).scalar_subquery()
+
+    return db.session.query(
+        User.id, User.company_id, User.department, User.role_level, User.created_at, User.last_active,
+        User.current_streak, User.last_check_in_date,
+        DailyResponse.id.label('response_id'),
+        DailyResponse.created_at.label('response_created_at'),
+        DailyResponse.burnout_score, DailyResponse.urgency_level, DailyResponse.analysis_status,
+        db.case((DailyResponse.id == latest_id, DailyResponse.ai_analysis), else_=None).label('latest_analysis')
+    ).outerjoin(DailyResponse, db.and_(
+        DailyResponse.user_id == User.id,
+        DailyResponse.created_at >= since
+    )).filter(
+        User.id == user_id
+    ).order_by(DailyResponse.created_at.desc()).limit(DASHBOARD_MAX_RESPONSES).all()
+
+def build_dashboard_payload(rows):
+    """Shape dashboard rows into the /api/user-data response"""
+    user = rows[0]
+    responses = [row for row in rows if row.response_id is not None]
+
+    scores = [row.burnout_score for row in responses if row.burnout_score is not None]
+    trend = calculate_trend(scores)
+
+    # Get latest clinical analysis if available
+    analysis_data = {}
+    if responses and responses[0].latest_analysis:
+        try:
+            analysis_data = json.loads(responses[0].latest_analysis)
+        except json.JSONDecodeError:
+            analysis_data = {}
+
+    average_score = sum(scores) / len(scores) if scores else 0
+    latest_analysis = {
+        'summary': analysis_data.get('summary', ''),
+        'concerns': analysis_data.get('concerns', []),
+        'date': responses[0].response_created_at.isoformat()
+    } if analysis_data else None
+
+    return {
+        'user': {
+            'id': user.id,
+            'company_id': user.company_id,
+            'department': user.department,
+            'role_level': user.role_level,
+            'created_at': user.created_at.isoformat(),
+            'last_active': user.last_active.isoformat() if user.last_active else None
+        },
+        'recent_responses': [{
+            'id': row.response_id,
+            'burnout_score': row.burnout_score,
+            'urgency_level': row.urgency_level,
+            'analysis_status': row.analysis_status,
+            'created_at': row.response_created_at.isoformat()
+        } for row in responses],
+        'summary': {
+            'total_responses': len(responses),
+            'average_score': average_score,
+            'trend': trend,
+            'latest_analysis': analysis_data.get('analysis'),
+            'clinical_sources': analysis_data.get('clinical_sources', [])
+        },
+        # Flat fields read by the dashboard page
+        'chart_data': [
+            {'date': row.response_created_at.isoformat(), 'score': row.burnout_score}
+            for row in reversed(responses) if row.burnout_score is not None
+        ],
+        'avg_score': average_score,
+        'total_responses': len(responses),
+        'streak': active_streak(user),
+        'trend': trend,
+        'latest_analysis': latest_analysis,
+        'progress_data': calculate_progress_metrics(user.id, datetime.utcnow() - timedelta(days=DASHBOARD_DAYS))
+    }
+
 def calculate_trend(scores):
     """Calculate trend from recent scores"""
     if len(scores) < 2:
@@ -1031,10 +2272,11 @@ def get_user_progress():
                 'streak': random.randint(3, 14)
             })
 
-        # Get responses from last 30 days
+        # Scores from the last 30 days (only the score column is loaded)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        responses = DailyResponse.query.filter_by(user_id=user_id) \
-            .filter(DailyResponse.created_at >= thirty_days_ago) \
+        responses = db.session.query(DailyResponse.burnout_score) \
+            .filter(DailyResponse.user_id == user_id,
+                    DailyResponse.created_at >= thirty_days_ago) \
             .order_by(DailyResponse.created_at.asc()).all()
 
         if not responses:
@@ -1045,7 +2287,7 @@ def get_user_progress():
             })
 
         # Calculate progress metrics
-        progress_data = calculate_progress_metrics(responses)
+        progress_data = calculate_progress_metrics(user_id, thirty_days_ago)
 
         # Calculate streak
         streak = calculate_check_in_streak(user_id)
@@ -1065,50 +2307,67 @@ def get_user_progress():
 
 @app.route('/api/company-analytics')
 def get_company_analytics():
-    """Get company-wide analytics (demo data for now)"""
+    """Get company-wide analytics aggregated from responses"""
     try:
-        period = request.args.get('period', '7d')
-
-        # Generate realistic demo data
-        demo_data = {
-            'total_users': 147,
-            'avg_wellness_score': 68.7,
-            'high_risk_count': 12,
-            'medium_risk_count': 28,
-            'low_risk_count': 107,
-            'participation_rate': 0.84,
-            'department_breakdown': [
-                {'department': 'Engineering', 'avg_score': 65.2, 'total': 45, 'high_risk': 8, 'medium_risk': 15},
-                {'department': 'Sales', 'avg_score': 58.1, 'total': 35, 'high_risk': 12, 'medium_risk': 18},
-                {'department': 'Marketing', 'avg_score': 72.3, 'total': 28, 'high_risk': 3, 'medium_risk': 8},
-                {'department': 'HR', 'avg_score': 78.9, 'total': 15, 'high_risk': 1, 'medium_risk': 4},
-                {'department': 'Finance', 'avg_score': 69.4, 'total': 24, 'high_risk': 2, 'medium_risk': 6}
-            ],
-            'trend_data': [
-                {'date': '2025-07-20', 'avg_score': 67.2},
-                {'date': '2025-07-21', 'avg_score': 68.1},
-                {'date': '2025-07-22', 'avg_score': 69.3},
-                {'date': '2025-07-23', 'avg_score': 68.7},
-                {'date': '2025-07-24', 'avg_score': 70.1},
-                {'date': '2025-07-25', 'avg_score': 69.8},
-                {'date': '2025-07-26', 'avg_score': 68.9},
-                {'date': '2025-07-27', 'avg_score': 68.7}
-            ],
-            'top_concerns': [
-                {'name': 'Heavy Workload', 'count': 89, 'percentage': 60.5},
-                {'name': 'Work-Life Balance', 'count': 67, 'percentage': 45.6},
-                {'name': 'Lack of Recognition', 'count': 45, 'percentage': 30.6},
-                {'name': 'Communication Issues', 'count': 38, 'percentage': 25.9},
-                {'name': 'Limited Growth Opportunities', 'count': 29, 'percentage': 19.7}
-            ]
-        }
+        if 'company_user' not in session:
+            return jsonify({'error': 'Company login required'}), 401
+
+        # Scoped to the session's company; company admins without one see all companies
+        company_id = (session.get('company_id') or '').lower().strip() or None
 
-        return jsonify(demo_data)
+        days = parse_analytics_period(request.args.get('period', '7d'))
+
+        maybe_rollup_company_metrics()
+
+        return jsonify(compute_company_analytics(company_id, days))
 
     except Exception as e:
         logger.error(f"Company analytics error: {str(e)}")
         return jsonify({'error': 'Failed to load company analytics'}), 500
 
+@app.route('/api/export-company-report', methods=['POST'])
+def export_company_report():
+    """Stream an anonymised company export (department/day aggregates and de-identified responses)"""
+    try:
+        if 'company_user' not in session:
+            return jsonify({'error': 'Company login required'}), 401
+
+        data = request.get_json(silent=True) or {}
+        options = data.get('options') or {}
+
+        # Scoped to the session's company, like the analytics; the body may only repeat it
+        company_id = (session.get('company_id') or '').lower().strip() or None
+        requested = (data.get('company_id') or '').lower().strip() or None
+        if requested and requested != company_id:
+            return jsonify({'error': 'Export is limited to your own company'}), 403
+
+        days = parse_analytics_period(data.get('period', '30d'))
+        since = datetime.combine(datetime.utcnow().date() - timedelta(days=days - 1), datetime.min.time())
+
+        include_aggregates = any(options.get(key, True) for key in ('overview', 'departments', 'trends'))
+        include_responses = options.get('responses', True)
+        compress = bool(data.get('compress'))
+
+        rows = company_export_rows(company_id, since, include_aggregates, include_responses)
+        filename = f"company-wellness-{company_id or 'all'}-{days}d.csv"
+
+        if compress:
+            return Response(
+                stream_with_context(gzip_chunks(rows)),
+                mimetype='application/gzip',
+                headers={'Content-Disposition': f'attachment; filename={filename}.gz'}
+            )
+
+        return Response(
+            stream_with_context(rows),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+    except Exception as e:
+        logger.error(f"Company export error: {str(e)}")
+        return jsonify({'error': 'Company export failed'}), 500
+
 @app.route('/api/emergency-help', methods=['POST'])
 def track_emergency_help():
     """Track emergency help usage (anonymous analytics)"""
@@ -1143,16 +2402,20 @@ def export_user_data():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get all responses
-        responses = DailyResponse.query.filter_by(user_id=user_id) \
-            .order_by(DailyResponse.created_at.desc()).all()
+        # Responses are streamed in batches, except for the PDF report
+        responses = with_response_children(read_session().query(DailyResponse).filter_by(user_id=user_id)) \
+            .order_by(DailyResponse.created_at.desc())
+        if format_type in ('json', 'ndjson'):
+            responses = responses.options(db.undefer(DailyResponse.ai_analysis))
 
         if format_type == 'csv':
-            return export_csv(responses)
+            return export_csv(responses.yield_per(EXPORT_BATCH_SIZE))
+        elif format_type == 'ndjson':
+            return export_ndjson(responses.yield_per(EXPORT_BATCH_SIZE))
         elif format_type == 'pdf':
-            return export_pdf(responses, user)
+            return export_pdf(responses.all(), user)
         else:  # json
-            return export_json(responses, user)
+            return export_json(responses.yield_per(EXPORT_BATCH_SIZE), user)
 
     except Exception as e:
         logger.error(f"Export error: {str(e)}")
@@ -1196,65 +2459,186 @@ def get_clinical_sources():
 
 # ==================== HELPER FUNCTIONS ====================
 
-def export_csv(responses):
-    """Export data as CSV"""
-    output = io.StringIO()
-    writer = csv.writer(output)
+EXPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_BYTES = 64 * 1024
 
-    # Headers
-    writer.writerow([
-        'Date', 'Wellness Score', 'Urgency Level', 'Concerns', 'Recommendations'
-    ])
-
-    # Data rows
-    for response in responses:
-        try:
-            concerns = json.loads(response.concerns) if response.concerns else []
-            recommendations = json.loads(response.recommendations) if response.recommendations else []
+def export_csv(responses):
+    """Export data as CSV, streamed row by row"""
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        # Headers
+        writer.writerow([
+            'Date', 'Wellness Score', 'Urgency Level', 'Concerns', 'Recommendations'
+        ])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+        # Data rows
+        for response in responses:
+            try:
+                concerns = response_concerns(response)
+                recommendations = response_recommendations(response)
+
+                writer.writerow([
+                    response.created_at.strftime('%Y-%m-%d %H:%M'),
+                    response.burnout_score or 0,
+                    response.urgency_level or 'low',
+                    '; '.join(concerns),
+                    '; '.join([r.get('action', str(r)) for r in recommendations if isinstance(r, dict)])
+                ])
+            except Exception as e:
+                logger.warning(f"CSV export row error: {e}")
+                continue
 
-            writer.writerow([
-                response.created_at.strftime('%Y-%m-%d %H:%M'),
-                response.burnout_score or 0,
-                response.urgency_level or 'low',
-                '; '.join(concerns),
-                '; '.join([r.get('action', str(r)) for r in recommendations if isinstance(r, dict)])
-            ])
-        except Exception as e:
-            logger.warning(f"CSV export row error: {e}")
-            continue
+            if output.tell() >= EXPORT_CHUNK_BYTES:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
 
-    output.seek(0)
+        yield output.getvalue()
 
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=bloom-wellness-data.csv'}
     )
 
+COMPANY_EXPORT_COLUMNS = [
+    'record_type', 'date', 'department', 'participant', 'responses',
+    'wellness_score', 'urgency_level', 'high_risk', 'medium_risk', 'low_risk'
+]
+
+def pseudonymize(user_id, key):
+    """Participant id under an export's key; it cannot be reversed to a user id"""
+    return hmac.new(key, user_id.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+def company_export_rows(company_id, since, include_aggregates=True, include_responses=True):
+    """CSV chunks of department/day aggregates followed by de-identified responses
+
+    Departments with fewer than EXPORT_MIN_GROUP_SIZE participants in the
+    period are left out entirely, and so are department-days with fewer
+    responses than that. Pseudonyms use a key drawn for each export, so
+    they link a participant's rows within one file but not across files.
+    """
+    reads = read_session()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    min_group = app.config['EXPORT_MIN_GROUP_SIZE']
+
+    department = db.func.coalesce(User.department, 'unassigned')
+    reported = {
+        (company, dept)
+        for company, dept, participants in company_responses_query(
+            company_id, since, User.company_id, department, db.func.count(db.distinct(DailyResponse.user_id)),
+            session=reads
+        ).group_by(User.company_id, department)
+        if participants >= min_group
+    }
+
+    def flush():
+        chunk = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return chunk
+
+    writer.writerow(COMPANY_EXPORT_COLUMNS)
+    yield flush()
+
+    if include_aggregates:
+        buckets = aggregate_responses(company_id=company_id, since=since, with_concerns=False, session=reads)
+        for (company, date), bucket in sorted(buckets.items(), key=lambda item: item[0][1]):
+            for dept, values in sorted(bucket['departments'].items()):
+                if (company, dept) not in reported or values['total'] < min_group:
+                    continue
+                writer.writerow([
+                    'department_day', date, dept, '', values['total'],
+                    bucket_wellness(values), '', values['high'], values['medium'], values['low']
+                ])
+        yield flush()
+
+    if include_responses:
+        # Only scalar columns: no free text, no timestamps finer than a day
+        responses = company_responses_query(
+            company_id, since,
+            DailyResponse.user_id, DailyResponse.created_at, User.company_id, department,
+            DailyResponse.burnout_score, DailyResponse.urgency_level,
+            session=reads
+        ).order_by(DailyResponse.created_at).yield_per(EXPORT_BATCH_SIZE)
+
+        key = secrets.token_bytes(32)
+        pseudonyms = {}
+        for user_id, created_at, company, dept, burnout_score, urgency_level in responses:
+            if (company, dept) not in reported:
+                continue
+            if user_id not in pseudonyms:
+                pseudonyms[user_id] = pseudonymize(user_id, key)
+            writer.writerow([
+                'response', created_at.date().isoformat(), dept, pseudonyms[user_id], 1,
+                wellness_score(burnout_score), urgency_level or 'low', '', '', ''
+            ])
+            if output.tell() >= EXPORT_CHUNK_BYTES:
+                yield flush()
+
+    yield flush()
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_record(response):
+    """One response as an export record"""
+    return {
+        'date': response.created_at.isoformat(),
+        'wellness_score': response.burnout_score,
+        'urgency_level': response.urgency_level,
+        'concerns': response_concerns(response),
+        'recommendations': response_recommendations(response),
+        'summary': json.loads(response.ai_analysis).get('summary', '') if response.ai_analysis else ''
+    }
+
 def export_json(responses, user):
-    """Export data as JSON"""
-    data = {
-        'user_info': {
-            'id': user.id,
-            'department': user.department,
-            'role_level': user.role_level,
-            'created_at': user.created_at.isoformat(),
-            'total_responses': len(responses)
-        },
-        'wellness_data': []
+    """Export data as JSON, streaming the wellness_data array item by item"""
+    user_info = {
+        'id': user.id,
+        'department': user.department,
+        'role_level': user.role_level,
+        'created_at': user.created_at.isoformat(),
+        'total_responses': read_session().query(DailyResponse).filter_by(user_id=user.id).count()
     }
 
-    for response in responses:
-        data['wellness_data'].append({
-            'date': response.created_at.isoformat(),
-            'wellness_score': response.burnout_score,
-            'urgency_level': response.urgency_level,
-            'concerns': json.loads(response.concerns) if response.concerns else [],
-            'recommendations': json.loads(response.recommendations) if response.recommendations else [],
-            'summary': json.loads(response.ai_analysis).get('summary', '') if response.ai_analysis else ''
-        })
+    def generate():
+        yield '{"user_info": ' + json.dumps(user_info) + ', "wellness_data": ['
+        separator = ''
+        for response in responses:
+            yield separator + json.dumps(export_record(response))
+            separator = ', '
+        yield ']}'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/json',
+        headers={'Content-Disposition': 'attachment; filename=bloom-wellness-data.json'}
+    )
+
+def export_ndjson(responses):
+    """Export data as newline-delimited JSON, one response per line"""
+    def generate():
+        for response in responses:
+            yield json.dumps(export_record(response)) + '\n'
 
-    return jsonify(data)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=bloom-wellness-data.ndjson'}
+    )
 
 def export_pdf(responses, user):
     """Export data as PDF report"""
@@ -1303,52 +2687,117 @@ def export_pdf(responses, user):
         logger.error(f"PDF export error: {str(e)}")
         return jsonify({'error': 'PDF generation failed'}), 500
 
-def calculate_progress_metrics(responses):
-    """Calculate detailed progress metrics from responses"""
-    if not responses:
-        return {}
+# Scale question categories feeding each dashboard progress bar: (dimension, higher answer is worse)
+PROGRESS_DIMENSIONS = {
+    'energy': ('energy', False),
+    'vigour': ('energy', False),
+    'fatigue': ('energy', True),
+    'emotional_exhaustion': ('energy', True),
+    'satisfaction': ('satisfaction', False),
+    'job_satisfaction': ('satisfaction', False),
+    'personal_accomplishment': ('satisfaction', False),
+    'depersonalization': ('satisfaction', True),
+    'work_life_balance': ('balance', False),
+    'work_life_impact': ('balance', True),
+    'recovery': ('balance', False),
+    'detachment': ('balance', False),
+    'job_control': ('stress', False),
+    'control': ('stress', False),
+    'coping': ('stress', False),
+    'anxiety': ('stress', True),
+    'anger_irritability': ('stress', True),
+    'job_demands': ('stress', True),
+    'work_overload': ('stress', True),
+    'stress': ('stress', True),
+}
+
+def calculate_progress_metrics(user_id, since):
+    """Average 0-10 progress per dashboard dimension from stored category scores"""
+    rows = db.session.query(
+        CategoryScore.category, db.func.avg(CategoryScore.value), db.func.count(CategoryScore.id)
+    ).filter(
+        CategoryScore.user_id == user_id,
+        CategoryScore.category.in_(PROGRESS_DIMENSIONS),
+        CategoryScore.created_at >= since
+    ).group_by(CategoryScore.category).all()
+
+    totals = {}
+    for category, avg_value, count in rows:
+        dimension, inverted = PROGRESS_DIMENSIONS[category]
+        # Answers are 1-10; flip categories where a high answer means a worse state
+        value = 11 - avg_value if inverted else avg_value
+        weighted, n = totals.get(dimension, (0.0, 0))
+        totals[dimension] = (weighted + value * count, n + count)
+
+    return {dimension: round(weighted / n, 1) for dimension, (weighted, n) in totals.items()}
+
+def record_check_in(user_id, check_in_date=None):
+    """Advance the user's streak for a check-in (called at submit, before commit)"""
+    user = db.session.get(User, user_id)
+    if not user:
+        return
+    apply_check_in(user, check_in_date or datetime.utcnow().date())
+
+def apply_check_in(user, check_in_date):
+    """Update streak counters for a check-in on a given day"""
+    last = user.last_check_in_date
+    if last is not None and check_in_date <= last:
+        return  # Same day (or out of order): streak unchanged
+
+    if last is not None and check_in_date - last == timedelta(days=1):
+        user.current_streak = (user.current_streak or 0) + 1
+    else:
+        user.current_streak = 1
 
-    # Mock category breakdown (in real app, you'd categorize questions)
-    random.seed(len(responses))  # Consistent "random" data based on response count
-
-    return {
-        'energy': random.uniform(5.0, 8.5),
-        'satisfaction': random.uniform(5.5, 8.0),
-        'balance': random.uniform(4.5, 7.5),
-        'stress': random.uniform(5.0, 8.0)
-    }
+    user.longest_streak = max(user.longest_streak or 0, user.current_streak)
+    user.last_check_in_date = check_in_date
 
 def calculate_check_in_streak(user_id):
-    """Calculate current check-in streak"""
+    """Current check-in streak, read from the user row"""
     try:
-        # Get all responses ordered by date descending
-        responses = DailyResponse.query.filter_by(user_id=user_id) \
-            .order_by(DailyResponse.created_at.desc()).all()
-
-        if not responses:
-            return 0
-
-        # Convert to dates only
-        response_dates = list(set(r.created_at.date() for r in responses))
-        response_dates.sort(reverse=True)
-
-        # Calculate streak
-        streak = 0
-        current_date = datetime.utcnow().date()
-
-        for response_date in response_dates:
-            if response_date == current_date or response_date == current_date - timedelta(days=streak):
-                streak += 1
-                current_date = response_date
-            else:
-                break
-
-        return streak
+        user = db.session.get(User, user_id)
+        return active_streak(user) if user else 0
 
     except Exception as e:
         logger.error(f"Streak calculation error: {str(e)}")
         return 0
 
+def active_streak(user):
+    """Stored streak if still alive: it lasts until a full day is missed"""
+    if user.last_check_in_date and user.last_check_in_date >= datetime.utcnow().date() - timedelta(days=1):
+        return user.current_streak or 0
+    return 0
+
+def backfill_check_in_streaks(batch_size=500):
+    """Rebuild streak counters from each user's distinct check-in days"""
+    updated = 0
+    last_id = ''
+    day = db.func.date(DailyResponse.created_at)
+    while True:
+        users = User.query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+        if not users:
+            return updated
+
+        for user in users:
+            user.current_streak = 0
+            user.longest_streak = 0
+            user.last_check_in_date = None
+            days = db.session.query(day).filter(DailyResponse.user_id == user.id) \
+                .distinct().order_by(day)
+            for (check_in_day,) in days:
+                apply_check_in(user, datetime.strptime(str(check_in_day), '%Y-%m-%d').date())
+            updated += 1
+
+        db.session.commit()
+        last_id = users[-1].id
+
+@app.cli.command('backfill-streaks')
+def backfill_streaks_command():
+    """Recompute check-in streaks for all users"""
+    started = time.time()
+    updated = backfill_check_in_streaks()
+    print(f"🔥 Recomputed streaks for {updated} users in {time.time() - started:.2f}s")
+
 def analyze_wellness_trend(responses):
     """Analyze wellness trend over time"""
     if len(responses) < 2:
@@ -1385,7 +2834,9 @@ def not_found(error):
             '/api/company-analytics',
             '/api/emergency-help',
             '/api/export-data',
-            '/api/clinical-sources'
+            '/api/clinical-sources',
+            '/api/export-company-report',
+            '/api/submissions/<response_id>'
         ]
     }), 404
 
@@ -1400,13 +2851,67 @@ def internal_error(error):
 
 # ==================== INITIALIZATION ====================
 
+# Columns added after their table was first created: (table, column, SQLAlchemy type, DDL constraints)
+SCHEMA_UPGRADES = [
+    ('daily_responses', 'analysis_status', db.String(20), "NOT NULL DEFAULT 'complete'"),
+    ('daily_responses', 'analyzed_at', db.DateTime(), ''),
+    ('company_metrics', 'last_response_id', db.Integer(), ''),
+    ('company_metrics', 'snapshot_id', db.Integer(), ''),
+    ('company_metrics', 'updated_at', db.DateTime(), ''),
+    ('users', 'current_streak', db.Integer(), 'NOT NULL DEFAULT 0'),
+    ('users', 'longest_streak', db.Integer(), 'NOT NULL DEFAULT 0'),
+    ('users', 'last_check_in_date', db.Date(), ''),
+]
+
+# Unique indexes added after their table was first created: (table, index name, columns).
+# Rows duplicating a key are removed first, keeping the newest.
+UNIQUE_INDEX_UPGRADES = [
+    ('company_metrics', 'uq_company_metrics_day', ('company_id', 'date')),
+]
+
+def upgrade_schema():
+    """Add columns and unique indexes that db.create_all() does not add to existing tables
+
+    Column types are compiled for the connected database, so DateTime
+    becomes DATETIME on SQLite and TIMESTAMP WITHOUT TIME ZONE on PostgreSQL.
+    """
+    inspector = db.inspect(db.engine)
+    for table, column, column_type, constraints in SCHEMA_UPGRADES:
+        if not inspector.has_table(table):
+            continue
+        if column in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        ddl = f"{column_type.compile(dialect=db.engine.dialect)} {constraints}".strip()
+        db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        db.session.commit()
+        print(f"🔧 Added column {table}.{column}")
+
+    for table, name, columns in UNIQUE_INDEX_UPGRADES:
+        if not inspector.has_table(table):
+            continue
+        # create_all() builds these as table constraints; SQLite names their index sqlite_autoindex_*
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        existing |= {constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+        if name in existing:
+            continue
+        key = ', '.join(columns)
+        removed = db.session.execute(db.text(
+            f'DELETE FROM {table} WHERE id NOT IN (SELECT max(id) FROM {table} GROUP BY {key})'
+        )).rowcount
+        db.session.execute(db.text(f'CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({key})'))
+        db.session.commit()
+        print(f"🔧 Added unique index {name} ({removed} duplicate rows removed)")
+
 def create_tables():
     """Create database tables"""
     with app.app_context():
         try:
             db.create_all()
+            upgrade_schema()
             print("🌸 Bloom database initialized successfully!")
 
+            warm_question_templates()
+
             # Test database connection
             user_count = User.query.count()
             response_count = DailyResponse.query.count()
@@ -1427,6 +2932,9 @@ def create_tables():
         except Exception as e:
             print(f"❌ Database initialization failed: {e}")
 
+# Precompute templated guideline retrieval for known departments
+warm_question_templates()
+
 if __name__ == '__main__':
     print("🚀 Starting Bloom server...")
     print("🌸 AI-powered burnout prevention platform")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark for Bloom Clinical AI
+Compares ChromaDB and the in-process NumPy index on latency and top-k
+agreement, and the NumPy storage modes on memory and recall@k
+"""
+
+import os
+import sys
+import json
+import argparse
+from types import SimpleNamespace
+from clinical_ai import clinical_kb
+from vector_index import benchmark_backends, compare_quantization
+
+# Queries in the style get_clinical_context sends
+DEFAULT_QUERIES = [
+    'burnout moderate risk intervention',
+    'stress management workplace mental health',
+    'sleep problems insomnia treatment',
+    'anxiety symptoms cognitive behavioral therapy',
+    'work life balance recovery',
+    'depression screening primary care',
+    'social support isolation employees',
+    'physical activity wellbeing exercise'
+]
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Benchmark ChromaDB against the NumPy vector index')
+    parser.add_argument('--instance-path', default='instance',
+                        help='Flask instance folder holding clinical_db (default: instance)')
+    parser.add_argument('--n-results', type=int, default=3,
+                        help='Guidelines returned per query (default: 3)')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='Times each query is timed per backend (default: 20)')
+    parser.add_argument('--quantization', action='store_true',
+                        help='Also compare float32, float16 and int8 storage on memory and recall@k')
+    parser.add_argument('--json', action='store_true', help='Print the raw results as JSON')
+    return parser.parse_args()
+
+def main():
+    """Build or map the NumPy index and time both backends"""
+    args = parse_args()
+
+    clinical_kb.init_app(SimpleNamespace(instance_path=os.path.abspath(args.instance_path)))
+    if clinical_kb.collection is None:
+        print("❌ Clinical knowledge base could not be initialized")
+        return 1
+
+    if clinical_kb.vector_index is None:
+        clinical_kb._open_vector_index()
+
+    results = benchmark_backends(clinical_kb, DEFAULT_QUERIES, n_results=args.n_results, repeats=args.repeats)
+    if results is None:
+        print("📚 No guidelines indexed; run ingest_guidelines.py first")
+        return 1
+
+    if args.quantization:
+        scratch = os.path.join(clinical_kb.persist_directory, 'vector_index.benchmark')
+        results['quantization'] = compare_quantization(clinical_kb.collection,
+                                                       clinical_kb.encode_queries(DEFAULT_QUERIES),
+                                                       scratch, k=args.n_results)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print("🌸 Bloom Retrieval Benchmark")
+    print("=" * 50)
+    print(f"📚 {results['rows']} guidelines, {results['queries']} queries, top {results['n_results']}")
+    for backend in ('chroma', 'numpy'):
+        timings = results[backend]
+        print(f"⏱️  {backend:<6} p50 {timings['p50_ms']:.3f} ms | p95 {timings['p95_ms']:.3f} ms | mean {timings['mean_ms']:.3f} ms")
+    print(f"🚀 Speedup (p50): {results['speedup_p50']}x")
+    print(f"🎯 Top-k overlap: {results['top_k_overlap']:.1%}")
+
+    for mode in results.get('quantization', []):
+        recall = f"recall@{mode['k']} {mode['recall']:.1%} -> {mode['recall_rescored']:.1%} rescored"
+        print(f"🗜️  {mode['dtype']:<7} scan {mode['scan_bytes'] / 1024:,.0f} KB "
+              f"({mode['memory_saved_pct']:.0f}% saved) | {recall}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,15 +5,67 @@ Integrates evidence-based clinical guidelines into AI responses
 
 import os
 import json
+import time
+import hashlib
+import threading
+import multiprocessing
 import fitz  # PyMuPDF
 import openai
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-from sentence_transformers import SentenceTransformer
 import chromadb
+from vector_index import NumpyVectorIndex, DEFAULT_RESCORE_FACTOR, ids_fingerprint
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from encoders import load_encoder, MODEL_NAME
 from flask import current_app
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows: ingestion runs without a cross-process lock
+    fcntl = None
+
+# Number of guideline sections encoded and written to ChromaDB per batch
+INGEST_BATCH_SIZE = int(os.getenv('CLINICAL_INGEST_BATCH_SIZE', '64'))
+
+# Worker processes used to parse PDFs during ingestion (1 = parse in-process)
+INGEST_WORKERS = int(os.getenv('CLINICAL_INGEST_WORKERS', '1'))
+
+# Record of ingested PDFs (path, size, mtime, SHA-256) kept next to the vector store
+MANIFEST_FILENAME = 'ingest_manifest.json'
+
+# How init_clinical_ai loads models: eager, preload or background
+CLINICAL_AI_INIT = os.getenv('CLINICAL_AI_INIT', 'eager').lower()
+
+# Query cache bounds: entries per cache (0 disables) and time-to-live in seconds
+QUERY_CACHE_SIZE = int(os.getenv('CLINICAL_QUERY_CACHE_SIZE', '512'))
+QUERY_CACHE_TTL = float(os.getenv('CLINICAL_QUERY_CACHE_TTL', '3600'))
+
+# Retrieval backend: 'chroma' queries ChromaDB, 'numpy' a memory-mapped matrix exported from it
+RETRIEVAL_BACKEND = os.getenv('CLINICAL_RETRIEVAL_BACKEND', 'chroma').lower()
+
+# NumPy index storage: float32, or float16/int8 scanned with full-precision rescoring
+VECTOR_INDEX_DTYPE = os.getenv('CLINICAL_VECTOR_INDEX_DTYPE', 'float32').lower()
+VECTOR_INDEX_RESCORE_FACTOR = int(os.getenv('CLINICAL_VECTOR_RESCORE_FACTOR', str(DEFAULT_RESCORE_FACTOR)))
+
+# Encoder backend: 'torch' (sentence-transformers) or 'onnx' (ONNX Runtime, exported on first use)
+ENCODER_BACKEND = os.getenv('CLINICAL_ENCODER_BACKEND', 'torch').lower()
+ENCODER_THREADS = int(os.getenv('CLINICAL_ENCODER_THREADS', '1'))
+ENCODER_QUANTIZE = os.getenv('CLINICAL_ENCODER_QUANTIZE', 'true').lower() == 'true'
+
+# Retrieval mode: 'dense' embeds every query, 'hybrid' adds an FTS5 lexical lane fused with RRF
+RETRIEVAL_MODE = os.getenv('CLINICAL_RETRIEVAL_MODE', 'dense').lower()
+
+# Candidates each lane contributes to the fused ranking in hybrid mode
+HYBRID_CANDIDATES = int(os.getenv('CLINICAL_HYBRID_CANDIDATES', '20'))
+
+# Largest share of the collection a query's words may all match for the lexical lane
+# to answer alone; broader (common-word) queries are always fused with dense retrieval
+LEXICAL_SHORTCUT_MAX_SHARE = float(os.getenv('CLINICAL_LEXICAL_SHORTCUT_MAX_SHARE', '0.02'))
+
 @dataclass
 class ClinicalGuideline:
     source: str
@@ -22,65 +74,237 @@ class ClinicalGuideline:
     evidence_level: str
     page_number: int
     citation: str
+    source_file: str = ''
+
+class QueryCache:
+    """Bounded, thread-safe LRU cache with a per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttl_seconds: float = QUERY_CACHE_TTL):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        if self.max_entries == 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Size, bounds and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+def normalize_query(query: str) -> str:
+    """Canonical cache key for a query (the MiniLM tokenizer is uncased)"""
+    return " ".join(query.lower().split())
+
+def llm_string_list(value) -> List[str]:
+    """Non-empty strings from an LLM list field; a bare string counts as one item"""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+def llm_bool(value, default: bool = False) -> bool:
+    """Parse an LLM boolean field, which may arrive as true, "false", "yes" or 1"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ('true', 'yes', 'y', '1'):
+            return True
+        if text in ('false', 'no', 'n', '0', ''):
+            return False
+    return default
 
 class ClinicalKnowledgeBase:
-    def __init__(self, app=None):
+    def __init__(self, app=None, batch_size: int = INGEST_BATCH_SIZE):
         self.encoder = None
+        self.encoder_info = {}
         self.client = None
-        self.collection = None
+        self._collection = None
         self.app = app
+        self.batch_size = max(1, batch_size)
+        self.persist_directory = None
+        self.ingest_failures = 0
+        self.startup_timings = {}
+
+        # Query embeddings depend only on the encoder; results also on the collection
+        self.embedding_cache = QueryCache()
+        self.result_cache = QueryCache()
+
+        # Templated queries resolved ahead of time:
+        # (query, n_results) -> (results, collection version, expiry)
+        self.template_queries = set()
+        self.precomputed = {}
+
+        # NumPy retrieval backend, rebuilt from the collection after ingestion
+        self.vector_index = None
+        self._index_dirty = False
+
+        # SQLite FTS5 lane of hybrid retrieval, written alongside the collection
+        self.lexical_index = None
+        self.retrieval_counts = {'lexical': 0, 'fused': 0}
+
+        # Deferred vector store opening (preload mode)
+        self._store_lock = threading.Lock()
+        self._store_deferred = False
+        self._store_pid = None
+        self._on_store_open = None
 
         if app is not None:
             self.init_app(app)
 
-    def init_app(self, app):
-        """Initialize with Flask app"""
+    def init_app(self, app, open_store: bool = True, on_store_open=None):
+        """Initialize with Flask app
+
+        With open_store=False only the encoder is loaded now. The vector store
+        is opened (and on_store_open called) the first time the collection is
+        used in each process, so a gunicorn --preload master can share the
+        model weights copy-on-write without handing ChromaDB handles across fork.
+        """
         self.app = app
 
+        if hasattr(app, 'instance_path'):
+            self.persist_directory = os.path.join(app.instance_path, 'clinical_db')
+        else:
+            self.persist_directory = os.path.join(os.getcwd(), 'instance', 'clinical_db')
+
         # Initialize sentence transformer
         print("🧠 Loading clinical AI models...")
+        start = time.perf_counter()
         try:
-            self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+            model_dir = os.path.join(os.path.dirname(self.persist_directory), 'onnx_models', MODEL_NAME)
+            self.encoder, self.encoder_info = load_encoder(ENCODER_BACKEND, model_dir,
+                                                           threads=ENCODER_THREADS, quantize=ENCODER_QUANTIZE)
             print("✅ Language model loaded")
         except Exception as e:
             print(f"⚠️  Warning: Could not load language model: {e}")
             return
+        finally:
+            self.startup_timings['encoder_load'] = round(time.perf_counter() - start, 3)
+
+        # Store reference in app
+        if hasattr(app, 'extensions'):
+            app.extensions = getattr(app, 'extensions', {})
+            app.extensions['clinical_kb'] = self
+
+        self._on_store_open = on_store_open
+        if open_store:
+            self._open_vector_store()
+        else:
+            self._store_deferred = True
+            print("⏳ Clinical guidelines database will open on first use")
+
+    @property
+    def collection(self):
+        """ChromaDB collection, opened on first use in this process when deferred"""
+        if self._collection is None and self._store_deferred and self._store_pid != os.getpid():
+            with self._store_lock:
+                if self._store_pid != os.getpid():
+                    self._open_vector_store()
+        return self._collection
+
+    @collection.setter
+    def collection(self, value):
+        self._collection = value
+
+    def _open_vector_store(self):
+        """Open the persistent ChromaDB collection"""
+        self._store_pid = os.getpid()
+        start = time.perf_counter()
 
         # Initialize ChromaDB
         try:
-            if hasattr(app, 'instance_path'):
-                persist_directory = os.path.join(app.instance_path, 'clinical_db')
-            else:
-                persist_directory = os.path.join(os.getcwd(), 'instance', 'clinical_db')
+            os.makedirs(self.persist_directory, exist_ok=True)
 
-            os.makedirs(persist_directory, exist_ok=True)
-
-            self.client = chromadb.PersistentClient(path=persist_directory)
+            self.client = chromadb.PersistentClient(path=self.persist_directory)
 
             # Get or create collection
             try:
-                self.collection = self.client.get_collection("clinical_guidelines")
+                self._collection = self.client.get_collection("clinical_guidelines")
                 print("📚 Loaded existing clinical guidelines database")
             except:
-                self.collection = self.client.create_collection("clinical_guidelines")
+                self._collection = self.client.create_collection("clinical_guidelines")
                 print("🆕 Created new clinical guidelines database")
 
-            # Store reference in app
-            if hasattr(app, 'extensions'):
-                app.extensions = getattr(app, 'extensions', {})
-                app.extensions['clinical_kb'] = self
-
             print("✅ Clinical knowledge base initialized")
 
         except Exception as e:
             print(f"❌ Error initializing ChromaDB: {e}")
             print("Clinical AI will be disabled")
+            return
+        finally:
+            self.startup_timings['vector_store_open'] = round(time.perf_counter() - start, 3)
+
+        if RETRIEVAL_BACKEND == 'numpy':
+            self._open_vector_index()
+
+        if RETRIEVAL_MODE == 'hybrid':
+            self._open_lexical_index()
+
+        if self._on_store_open is not None:
+            try:
+                self._on_store_open()
+            except Exception as e:
+                print(f"⚠️  Warning: Could not sync clinical guidelines: {e}")
 
     def process_pdf_guidelines(self, pdf_path: str, source_name: str) -> int:
         """Process PDF and extract clinical guidelines"""
         print(f"📖 Processing {source_name} from {pdf_path}")
 
-        guidelines_added = 0
+        start = time.perf_counter()
+        guidelines = self.extract_pdf_guidelines(pdf_path, source_name)
+        guidelines_added = self.add_guidelines(guidelines)
+
+        print(f"✅ Added {guidelines_added} guidelines from {source_name}")
+        report_ingest_rate(guidelines_added, time.perf_counter() - start)
+
+        return guidelines_added
+
+    def extract_pdf_guidelines(self, pdf_path: str, source_name: str) -> List[ClinicalGuideline]:
+        """Extract clinical guideline sections from every page of a PDF without embedding them"""
+        guidelines = []
 
         try:
             doc = fitz.open(pdf_path)
@@ -97,25 +321,22 @@ class ClinicalKnowledgeBase:
                 sections = self._extract_clinical_sections(text, source_name)
 
                 for section in sections:
-                    guideline = ClinicalGuideline(
+                    guidelines.append(ClinicalGuideline(
                         source=source_name,
                         topic=section['topic'],
                         content=section['content'],
                         evidence_level=section.get('evidence_level', 'Not specified'),
                         page_number=page_num + 1,
-                        citation=f"{source_name}, Page {page_num + 1}"
-                    )
-
-                    self._add_guideline_to_db(guideline)
-                    guidelines_added += 1
+                        citation=f"{source_name}, Page {page_num + 1}",
+                        source_file=os.path.basename(pdf_path)
+                    ))
 
             doc.close()
-            print(f"✅ Added {guidelines_added} guidelines from {source_name}")
 
         except Exception as e:
             print(f"❌ Error processing {pdf_path}: {e}")
 
-        return guidelines_added
+        return guidelines
 
     def _extract_clinical_sections(self, text: str, source: str) -> List[Dict]:
         """Extract meaningful clinical sections from text"""
@@ -187,60 +408,385 @@ class ClinicalKnowledgeBase:
         else:
             return 'Clinical Guidelines'
 
-    def _add_guideline_to_db(self, guideline: ClinicalGuideline):
-        """Add guideline to vector database"""
+    def _open_vector_index(self):
+        """Map the NumPy index, building it from the collection if missing or out of date"""
+        start = time.perf_counter()
+        try:
+            self.vector_index = self._new_vector_index()
+            if not self.vector_index.load() or not self.vector_index.is_current(self._collection_fingerprint()):
+                self.vector_index.build_from_collection(self._collection)
+            print(f"🧮 NumPy retrieval backend ready ({len(self.vector_index)} guidelines)")
+        except Exception as e:
+            print(f"⚠️  Warning: NumPy vector index unavailable, using ChromaDB: {e}")
+            self.vector_index = None
+        finally:
+            self.startup_timings['vector_index_open'] = round(time.perf_counter() - start, 3)
+
+    def _open_lexical_index(self):
+        """Open the FTS5 index, filling it from the collection if it is out of step"""
+        start = time.perf_counter()
         try:
-            # Create embedding
-            embedding = self.encoder.encode(guideline.content)
-
-            # Create unique ID
-            guideline_id = f"{guideline.source}_{guideline.page_number}_{hash(guideline.content)}"
-
-            # Add to collection
-            self.collection.add(
-                embeddings=[embedding.tolist()],
-                documents=[guideline.content],
-                metadatas=[{
-                    'source': guideline.source,
-                    'topic': guideline.topic,
-                    'evidence_level': guideline.evidence_level,
-                    'page_number': guideline.page_number,
-                    'citation': guideline.citation
-                }],
-                ids=[guideline_id]
+            self.lexical_index = LexicalIndex(self.lexical_index_path())
+            if ids_fingerprint(self.lexical_index.ids()) != self._collection_fingerprint():
+                self.lexical_index.rebuild_from_collection(self._collection)
+            print(f"🔎 Hybrid retrieval ready ({self.lexical_index.count()} guidelines in the lexical index)")
+        except Exception as e:
+            print(f"⚠️  Warning: Lexical index unavailable, using dense retrieval only: {e}")
+            self.lexical_index = None
+        finally:
+            self.startup_timings['lexical_index_open'] = round(time.perf_counter() - start, 3)
+
+    def _collection_fingerprint(self) -> str:
+        """Fingerprint of the guideline IDs in the collection; IDs are content hashes"""
+        return ids_fingerprint(self._collection.get(include=[])['ids'])
+
+    def vector_index_path(self) -> str:
+        return os.path.join(self.persist_directory, 'vector_index')
+
+    def lexical_index_path(self) -> str:
+        return os.path.join(self.persist_directory, 'lexical.sqlite3')
+
+    def refresh_lexical_index(self):
+        """Rebuild an FTS5 index found on disk that this process does not keep up to date
+
+        Processes in dense mode (e.g. the offline ingestion CLI) write only
+        ChromaDB, so hybrid workers sharing the file would otherwise keep
+        answering from the old guideline text.
+        """
+        if self.lexical_index is not None or self.collection is None:
+            return
+        if not os.path.exists(self.lexical_index_path()):
+            return
+
+        try:
+            index = LexicalIndex(self.lexical_index_path())
+            if ids_fingerprint(index.ids()) != self._collection_fingerprint():
+                index.rebuild_from_collection(self.collection)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not rebuild lexical index: {e}")
+
+    def _new_vector_index(self) -> NumpyVectorIndex:
+        return NumpyVectorIndex(self.vector_index_path(), dtype=VECTOR_INDEX_DTYPE,
+                                rescore_factor=VECTOR_INDEX_RESCORE_FACTOR)
+
+    def refresh_vector_index(self):
+        """Rebuild the NumPy index after the collection changed
+
+        Also rebuilds an index found on disk when this process searches
+        ChromaDB (e.g. the offline ingestion CLI), so workers using the
+        NumPy backend see the new guidelines on their next query.
+        """
+        if not self._index_dirty or self.collection is None:
+            return
+
+        index = self.vector_index
+        if index is None:
+            index = self._new_vector_index()
+            if not index.exists():
+                return
+
+        try:
+            index.build_from_collection(self.collection)
+            self._index_dirty = False
+            self._invalidate_query_cache()
+        except Exception as e:
+            print(f"⚠️  Warning: Could not rebuild NumPy vector index: {e}")
+
+    def add_guidelines(self, guidelines: List[ClinicalGuideline], batch_size: Optional[int] = None) -> int:
+        """Encode guidelines in batches and bulk-write them to the vector database"""
+        if not guidelines or self.encoder is None or self.collection is None:
+            return 0
+
+        batch_size = max(1, batch_size or self.batch_size)
+        added = 0
+
+        for start in range(0, len(guidelines), batch_size):
+            added += self._add_guideline_batch(guidelines[start:start + batch_size])
+
+        return added
+
+    def _add_guideline_batch(self, batch: List[ClinicalGuideline]) -> int:
+        """Encode one batch as a single matrix and upsert it with one ChromaDB call"""
+        try:
+            # One forward pass for the whole batch instead of one per paragraph
+            embeddings = np.asarray(
+                self.encoder.encode(
+                    [guideline.content for guideline in batch],
+                    batch_size=len(batch),
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                ),
+                dtype=np.float32
+            )
+
+            # ChromaDB rejects duplicate IDs within a single call
+            ids, documents, metadatas, rows = [], [], [], []
+            seen_ids = set()
+            for row, guideline in enumerate(batch):
+                guideline_id = self._guideline_id(guideline)
+                if guideline_id in seen_ids:
+                    continue
+                seen_ids.add(guideline_id)
+
+                ids.append(guideline_id)
+                documents.append(guideline.content)
+                metadatas.append(self._guideline_metadata(guideline))
+                rows.append(row)
+
+            self.collection.upsert(
+                embeddings=embeddings[rows].tolist(),
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
             )
+            if self.lexical_index is not None:
+                self.lexical_index.upsert(ids, documents, metadatas)
+            self._collection_changed()
+
+            return len(ids)
+
+        except Exception as e:
+            print(f"Warning: Could not add guideline batch: {e}")
+            self.ingest_failures += 1
+            return 0
+
+    def delete_guidelines(self, where: Dict):
+        """Delete every guideline section whose metadata matches the filter"""
+        if self.collection is None:
+            return
+
+        try:
+            self.collection.delete(where=where)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(where)
+            self._collection_changed()
         except Exception as e:
-            print(f"Warning: Could not add guideline: {e}")
+            print(f"Warning: Could not delete guidelines matching {where}: {e}")
+            self.ingest_failures += 1
+
+    def manifest_path(self) -> Optional[str]:
+        """Location of the ingestion manifest, if the vector store is persistent"""
+        if not self.persist_directory:
+            return None
+        return os.path.join(self.persist_directory, MANIFEST_FILENAME)
+
+    def _guideline_id(self, guideline: ClinicalGuideline) -> str:
+        """Create a stable content-hashed ID for a guideline section"""
+        # hash() is salted per process, so only a real digest survives restarts
+        digest = hashlib.sha256(guideline.content.encode('utf-8')).hexdigest()[:32]
+        return f"{guideline.source}_{guideline.page_number}_{digest}"
+
+    def _guideline_metadata(self, guideline: ClinicalGuideline) -> Dict:
+        """Build the metadata stored alongside a guideline section"""
+        return {
+            'source': guideline.source,
+            'topic': guideline.topic,
+            'evidence_level': guideline.evidence_level,
+            'page_number': guideline.page_number,
+            'citation': guideline.citation,
+            'source_file': guideline.source_file
+        }
+
+    def _add_guideline_to_db(self, guideline: ClinicalGuideline):
+        """Add guideline to vector database"""
+        self.add_guidelines([guideline])
 
     def query_guidelines(self, query: str, n_results: int = 3) -> List[Dict]:
         """Query guidelines relevant to the question"""
         if not self.collection:
             return []
 
-        try:
-            # Create query embedding
-            query_embedding = self.encoder.encode(query)
+        query = normalize_query(query)
+        cache_key = (query, n_results)
+        version = self.collection_version()
 
-            # Search collection
-            results = self.collection.query(
-                query_embeddings=[query_embedding.tolist()],
-                n_results=n_results
-            )
+        precomputed = self.precomputed.get(cache_key)
+        if precomputed is not None:
+            guidelines, precomputed_version, expires_at = precomputed
+            if precomputed_version == version and expires_at > time.monotonic():
+                return list(guidelines)
 
-            guidelines = []
-            for i in range(len(results['documents'][0])):
-                guidelines.append({
-                    'content': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'relevance_score': 1 - results['distances'][0][i]
-                })
+        # Keyed on the collection version so ingestion in another process misses
+        result_key = (query, n_results, version)
+        cached = self.result_cache.get(result_key)
+        if cached is not None:
+            return list(cached)
 
-            return guidelines
+        try:
+            guidelines = self._search_many([query], n_results)[0]
+            if cache_key in self.template_queries:
+                # Stale template results are resolved again on their next use
+                self.precomputed[cache_key] = (guidelines, version, time.monotonic() + QUERY_CACHE_TTL)
+            else:
+                self.result_cache.set(result_key, guidelines)
+            return list(guidelines)
 
         except Exception as e:
             print(f"Error querying guidelines: {e}")
             return []
 
+    def _search_many(self, queries: List[str], n_results: int) -> List[List[Dict]]:
+        """Search normalized queries with the configured retrieval mode
+
+        In hybrid mode a query whose words all appear together in at least
+        n_results guidelines, but in no more than LEXICAL_SHORTCUT_MAX_SHARE
+        of the collection, is specific enough for the lexical lane to answer
+        alone, without running the encoder. The rest are embedded in one
+        batch, and their dense ranking is fused with an any-word lexical
+        ranking. Both paths score by reciprocal rank, so relevance_score
+        has one scale in hybrid mode.
+        """
+        if self.lexical_index is None:
+            return self._dense_search_many(queries, n_results)
+
+        max_matches = max(n_results, int(LEXICAL_SHORTCUT_MAX_SHARE * self.lexical_index.count()))
+        results = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            exact = self.lexical_index.search(query, max_matches + 1, operator='AND')
+            if n_results <= len(exact) <= max_matches:
+                results[i] = reciprocal_rank_fusion([exact], n_results)
+                self.retrieval_counts['lexical'] += 1
+            else:
+                pending.append(i)
+
+        if pending:
+            candidates = max(n_results, HYBRID_CANDIDATES)
+            dense = self._dense_search_many([queries[i] for i in pending], candidates)
+            for i, dense_ranking in zip(pending, dense):
+                lexical_ranking = self.lexical_index.search(queries[i], candidates, operator='OR')
+                results[i] = reciprocal_rank_fusion([lexical_ranking, dense_ranking], n_results)
+                self.retrieval_counts['fused'] += 1
+
+        return results
+
+    def _dense_search_many(self, queries: List[str], n_results: int) -> List[List[Dict]]:
+        """Embed normalized queries and search the configured backend in one call"""
+        embeddings = self.encode_queries(queries)
+
+        # Stale while ingestion is writing; ChromaDB answers until it is rebuilt
+        if self.vector_index is not None and not self._index_dirty:
+            return self.vector_index.search(np.vstack(embeddings), n_results)
+
+        # Search collection
+        results = self.collection.query(
+            query_embeddings=[embedding.tolist() for embedding in embeddings],
+            n_results=n_results
+        )
+
+        all_guidelines = []
+        for q in range(len(queries)):
+            guidelines = []
+            for i in range(len(results['documents'][q])):
+                guidelines.append({
+                    'content': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'relevance_score': 1 - results['distances'][q][i]
+                })
+            all_guidelines.append(guidelines)
+
+        return all_guidelines
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Embed a normalized query, reusing cached embeddings"""
+        return self.encode_queries([query])[0]
+
+    def encode_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Embed normalized queries, encoding all cache misses in one batch"""
+        embeddings = [self.embedding_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            encoded = self.encoder.encode([queries[i] for i in missing], show_progress_bar=False)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                self.embedding_cache.set(queries[i], embedding)
+
+        return embeddings
+
+    def register_template_queries(self, queries: List[str], n_results: int = 3) -> int:
+        """Register templated queries and precompute any not yet resolved"""
+        keys = {(normalize_query(query), n_results) for query in queries}
+        new_keys = keys - self.template_queries
+        self.template_queries |= new_keys
+        return self.precompute_template_queries(new_keys)
+
+    def precompute_template_queries(self, keys=None) -> int:
+        """Resolve registered template queries against the collection
+
+        Runs after ingestion so request handlers get a dictionary lookup
+        instead of an encoder forward pass plus a vector search. Does nothing
+        until the vector store is open in this process.
+        """
+        if self._collection is None:
+            return 0
+
+        keys = set(self.template_queries if keys is None else keys)
+        if not keys:
+            return 0
+
+        start = time.perf_counter()
+        version = self.collection_version()
+        expires_at = time.monotonic() + QUERY_CACHE_TTL
+        by_n_results = {}
+        for query, n_results in keys:
+            by_n_results.setdefault(n_results, []).append(query)
+
+        precomputed = dict(self.precomputed)
+        try:
+            for n_results, queries in by_n_results.items():
+                for query, guidelines in zip(queries, self._search_many(queries, n_results)):
+                    precomputed[(query, n_results)] = (guidelines, version, expires_at)
+        except Exception as e:
+            print(f"Warning: Could not precompute template queries: {e}")
+            return 0
+
+        # Swap in a new dict so concurrent readers never see a partial update
+        self.precomputed = precomputed
+        print(f"🗂️  Precomputed {len(keys)} template queries in {time.perf_counter() - start:.2f}s")
+        return len(keys)
+
+    def _invalidate_query_cache(self):
+        """Forget cached and precomputed results after the collection changes"""
+        self.result_cache.clear()
+        self.precomputed = {}
+
+    def collection_version(self):
+        """Changes whenever any process rewrites the guidelines
+
+        Other processes cannot clear this process's caches, but ingestion
+        rebuilds the NumPy index and saves the manifest, so their file
+        modification times identify the collection contents.
+        """
+        index_version = self.vector_index.current_version() if self.vector_index is not None else None
+
+        manifest_version = None
+        manifest_path = self.manifest_path()
+        if manifest_path:
+            try:
+                manifest_version = os.stat(manifest_path).st_mtime_ns
+            except OSError:
+                pass
+
+        return (index_version, manifest_version)
+
+    def _collection_changed(self):
+        """Invalidate caches and mark the NumPy index for rebuilding"""
+        self._invalidate_query_cache()
+        self._index_dirty = True
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss statistics for the query caches"""
+        stats = {
+            'embeddings': self.embedding_cache.stats(),
+            'results': self.result_cache.stats()
+        }
+        if self.vector_index is not None:
+            stats['vector_index'] = self.vector_index.stats()
+        if self.lexical_index is not None:
+            stats['hybrid'] = dict(self.retrieval_counts)
+        return stats
+
     def get_clinical_context(self, user_responses: Dict, burnout_score: float) -> str:
         """Build clinical context based on user responses and burnout score"""
         # Create query from user responses
@@ -300,11 +846,13 @@ class ClinicalAIAssistant:
             self.client = None
             self.openai_available = False
 
-    def generate_clinical_analysis(self, user_responses: Dict, burnout_score: float) -> Dict:
+    def generate_clinical_analysis(self, user_responses: Dict, burnout_score: float,
+                                   clinical_context: Optional[str] = None) -> Dict:
         """Generate evidence-based analysis using clinical guidelines"""
 
-        # Get clinical context
-        clinical_context = self.kb.get_clinical_context(user_responses, burnout_score)
+        # Get clinical context unless the caller already retrieved it
+        if clinical_context is None:
+            clinical_context = self.kb.get_clinical_context(user_responses, burnout_score)
 
         if not self.openai_available:
             # Use fallback analysis when OpenAI is not available
@@ -349,6 +897,106 @@ class ClinicalAIAssistant:
             print(f"Error generating clinical analysis: {e}")
             return self._generate_fallback_analysis(user_responses, burnout_score, clinical_context)
 
+    def generate_combined_analysis(self, user_responses: Dict, burnout_score: float,
+                                   clinical_context: Optional[str] = None) -> Dict:
+        """Generate the analysis, risk factors and 3 recommendations in one structured request
+
+        Returns the same shape as generate_clinical_analysis plus a
+        'recommendations' list of {action, rationale, implementation,
+        evidence_basis} dicts. The key is absent when the fallback is used.
+        """
+        if clinical_context is None:
+            clinical_context = self.kb.get_clinical_context(user_responses, burnout_score)
+
+        if not self.openai_available:
+            return self._generate_fallback_analysis(user_responses, burnout_score, clinical_context)
+
+        prompt = self._build_combined_prompt(user_responses, burnout_score, clinical_context)
+
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": """You are a clinical AI assistant specializing in workplace mental health and burnout prevention. 
+                        Base your responses strictly on provided evidence-based clinical guidelines. 
+                        Always cite sources and indicate evidence levels. 
+                        Recommend seeking professional help when appropriate. 
+                        Respond only with a JSON object."""
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.3,
+                max_tokens=1800
+            )
+
+            result = json.loads(response.choices[0].message.content)
+            if not isinstance(result, dict):
+                raise ValueError(f"expected a JSON object, got {type(result).__name__}")
+
+            # The model output is untrusted: keep only fields of the expected types
+            raw_recommendations = result.get('recommendations')
+            recommendations = [
+                {key: value for key, value in rec.items() if isinstance(value, str)}
+                for rec in (raw_recommendations if isinstance(raw_recommendations, list) else [])
+                if isinstance(rec, dict) and isinstance(rec.get('action'), str) and rec['action'].strip()
+            ][:3]
+            ai_analysis = result.get('analysis') if isinstance(result.get('analysis'), str) else ''
+
+            return {
+                'analysis': ai_analysis,
+                'structured': {
+                    'risk_factors': llm_string_list(result.get('risk_factors')),
+                    'recommendations': [rec['action'] for rec in recommendations],
+                    'interventions': [rec.get('implementation', '') for rec in recommendations],
+                    'professional_help': llm_bool(result.get('professional_help'),
+                                                  default='seek professional' in ai_analysis.lower())
+                },
+                'recommendations': recommendations,
+                'clinical_sources': self._extract_sources_used(clinical_context),
+                'confidence': self._calculate_confidence(clinical_context)
+            }
+
+        except Exception as e:
+            print(f"Error generating combined clinical analysis: {e}")
+            return self._generate_fallback_analysis(user_responses, burnout_score, clinical_context)
+
+    def _build_combined_prompt(self, responses: Dict, score: float, context: str) -> str:
+        """Build the single-request prompt covering analysis and recommendations"""
+        return f"""
+Based on the following evidence-based clinical guidelines, analyze this workplace burnout assessment:
+
+CLINICAL GUIDELINES CONTEXT:
+{context}
+
+USER ASSESSMENT DATA:
+Burnout Risk Score: {score}/100
+Detailed User Responses: {json.dumps(responses, indent=2)}
+
+Return a JSON object with exactly these keys:
+{{
+    "analysis": "clinical assessment, risk evaluation, professional help assessment and cited evidence sources with evidence levels",
+    "risk_factors": ["specific clinical indicators or risk factors present in the responses"],
+    "professional_help": true or false,
+    "recommendations": [
+        {{
+            "action": "detailed recommendation text addressing their specific situation",
+            "rationale": "why this helps their particular case based on clinical evidence",
+            "implementation": "specific steps to take",
+            "evidence_basis": "clinical guideline or research that supports this"
+        }}
+    ]
+}}
+
+Generate exactly 3 recommendations. Each must address the specific issues the user described,
+be based on the clinical guidelines provided, include concrete steps, and be 2-3 sentences long.
+"""
+
     def _build_clinical_prompt(self, responses: Dict, score: float, context: str) -> str:
         """Build enhanced prompt for AI analysis with specific recommendation generation"""
         return f"""
@@ -496,41 +1144,287 @@ Focus especially on the user's specific responses and tailor recommendations to
 clinical_kb = ClinicalKnowledgeBase()
 clinical_ai = None
 
-def init_clinical_ai(app):
-    """Initialize clinical AI with Flask app"""
+# Startup progress and timings reported on /health
+startup_status = {
+    'mode': CLINICAL_AI_INIT,
+    'state': 'not_started',
+    'pid': None,
+    'error': None
+}
+
+def init_clinical_ai(app, mode: Optional[str] = None):
+    """Initialize clinical AI with Flask app
+
+    Modes (default from CLINICAL_AI_INIT):
+      eager      - load the encoder, open the vector store and sync guidelines now
+      preload    - load the encoder now; each process opens the vector store and
+                   syncs guidelines on first use. Run gunicorn with --preload so
+                   the model is loaded once in the master and shared copy-on-write
+      background - run the eager steps in a daemon thread; get_clinical_ai()
+                   returns None, so callers serve fallback questions, until ready
+    """
+    mode = (mode or CLINICAL_AI_INIT).lower()
+    startup_status.update(mode=mode, state='loading', pid=os.getpid(), error=None)
+
+    if mode == 'background':
+        thread = threading.Thread(target=_init_clinical_ai, args=(app, mode),
+                                  name='clinical-ai-init', daemon=True)
+        thread.start()
+        print("⏳ Clinical AI loading in the background, serving fallbacks until ready")
+        return
+
+    _init_clinical_ai(app, mode)
+
+def _init_clinical_ai(app, mode: str):
+    """Load models and guidelines, recording how long each step takes"""
     global clinical_ai
 
+    start = time.perf_counter()
+
     try:
-        clinical_kb.init_app(app)
+        if mode == 'preload':
+            clinical_kb.init_app(app, open_store=False, on_store_open=lambda: sync_guidelines(app))
+        else:
+            clinical_kb.init_app(app)
+            sync_guidelines(app)
+
         clinical_ai = ClinicalAIAssistant(clinical_kb)
 
-        # Load guidelines from PDFs if they exist
-        if hasattr(app, 'instance_path'):
-            guidelines_dir = os.path.join(app.instance_path, 'guidelines')
-        else:
-            guidelines_dir = os.path.join(os.getcwd(), 'instance', 'guidelines')
+        print("🌟 Clinical AI system initialized")
+        startup_status['state'] = 'ready'
+
+    except Exception as e:
+        print(f"⚠️  Warning: Clinical AI initialization failed: {e}")
+        print("   App will continue without clinical AI features")
+        clinical_ai = None
+        startup_status.update(state='failed', error=str(e))
 
+    finally:
+        clinical_kb.startup_timings['total'] = round(time.perf_counter() - start, 3)
+
+def sync_guidelines(app):
+    """Bring the vector store in line with the PDFs in the guidelines directory"""
+    # Load guidelines from PDFs if they exist
+    if hasattr(app, 'instance_path'):
+        guidelines_dir = os.path.join(app.instance_path, 'guidelines')
+    else:
+        guidelines_dir = os.path.join(os.getcwd(), 'instance', 'guidelines')
+
+    start = time.perf_counter()
+    try:
         if os.path.exists(guidelines_dir):
             load_pdf_guidelines(guidelines_dir)
         else:
             print(f"📁 Guidelines directory not found: {guidelines_dir}")
             print("   Create it and add PDF guidelines for enhanced clinical AI")
 
-        print("🌟 Clinical AI system initialized")
+        # Templates registered before the store was ready are resolved now
+        clinical_kb.precompute_template_queries()
+    finally:
+        clinical_kb.startup_timings['guideline_sync'] = round(time.perf_counter() - start, 3)
+
+def get_startup_report() -> Dict:
+    """Startup mode, state and per-step timings in seconds for this process"""
+    return {
+        **startup_status,
+        'worker_pid': os.getpid(),
+        'encoder': dict(clinical_kb.encoder_info),
+        'timings': dict(clinical_kb.startup_timings)
+    }
+
+def load_pdf_guidelines(guidelines_dir: str, batch_size: Optional[int] = None,
+                        workers: Optional[int] = None, force: bool = False) -> int:
+    """Ingest new or changed PDF guidelines from directory
+
+    PDFs are tracked in a manifest (path, size, mtime, SHA-256) stored next to
+    the vector store. Unchanged files are skipped after a stat call, changed
+    files have their old sections replaced, and sections of removed files are
+    deleted. Pass force=True to re-ingest everything.
+    """
+    manifest_path = clinical_kb.manifest_path()
+
+    with _ingest_lock(manifest_path):
+        manifest = {} if force else load_ingest_manifest(manifest_path)
+        manifest_changed = force
+
+        pdf_files = sorted(f for f in os.listdir(guidelines_dir) if f.endswith('.pdf'))
+        documents = []
+        new_entries = {}
+
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(guidelines_dir, pdf_file)
+            source_name = guideline_source_name(pdf_file)
+            stat = os.stat(pdf_path)
+            entry = manifest.get(pdf_file)
+
+            # Fast path: size and mtime unchanged means no hashing at all
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+
+            digest = file_sha256(pdf_path)
+            if entry and entry['sha256'] == digest:
+                entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                manifest_changed = True
+                continue
+
+            if entry:
+                clinical_kb.delete_guidelines({'source_file': pdf_file})
+            else:
+                # Sections written before the manifest existed only carry the source name
+                clinical_kb.delete_guidelines({'source': source_name})
+
+            documents.append((pdf_path, source_name))
+            new_entries[pdf_file] = {
+                'path': pdf_path,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha256': digest
+            }
 
-    except Exception as e:
-        print(f"⚠️  Warning: Clinical AI initialization failed: {e}")
-        print("   App will continue without clinical AI features")
-        clinical_ai = None
+        for pdf_file in [f for f in manifest if f not in pdf_files]:
+            print(f"🗑️  Removing guidelines from deleted {pdf_file}")
+            clinical_kb.delete_guidelines({'source_file': pdf_file})
+            del manifest[pdf_file]
+            manifest_changed = True
+
+        guidelines_added = 0
+        if documents:
+            failures_before = clinical_kb.ingest_failures
+            guidelines_added = _ingest_documents(documents, batch_size, workers)
+
+            # Files whose sections failed to write are retried on the next run
+            if clinical_kb.ingest_failures == failures_before:
+                manifest.update(new_entries)
+                manifest_changed = True
+        else:
+            print(f"📚 Guidelines up to date ({len(pdf_files)} PDFs unchanged)")
+
+        if manifest_changed:
+            save_ingest_manifest(manifest_path, manifest)
+
+        clinical_kb.refresh_vector_index()
+        clinical_kb.refresh_lexical_index()
+
+    return guidelines_added
+
+def _ingest_documents(documents: List[Tuple[str, str]], batch_size: Optional[int] = None,
+                      workers: Optional[int] = None) -> int:
+    """Extract, embed and write the given (pdf_path, source_name) documents
+
+    With workers > 1, PDF parsing and section extraction fan out across a
+    process pool while this process acts as the single writer that embeds
+    sections and writes them to ChromaDB. The pool spawns fresh
+    interpreters: forking after torch, sentence-transformers and ChromaDB
+    have started threads can deadlock the children.
+    """
+    batch_size = max(1, batch_size or clinical_kb.batch_size)
+    workers = INGEST_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(documents)))
+
+    start = time.perf_counter()
+    pending = []
+    guidelines_added = 0
+
+    def enqueue(guidelines: List[ClinicalGuideline]):
+        nonlocal pending, guidelines_added
+        pending.extend(guidelines)
+
+        # Flush full batches so memory stays bounded on large corpora
+        while len(pending) >= batch_size:
+            guidelines_added += clinical_kb.add_guidelines(pending[:batch_size], batch_size)
+            pending = pending[batch_size:]
+
+    if workers > 1:
+        print(f"🧵 Parsing {len(documents)} PDFs with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_pdf_worker) as executor:
+            futures = {
+                executor.submit(_extract_pdf_worker, pdf_path, source_name): pdf_path
+                for pdf_path, source_name in documents
+            }
+            for future in as_completed(futures):
+                try:
+                    enqueue(future.result())
+                except Exception as e:
+                    print(f"❌ Error processing {futures[future]}: {e}")
+                    clinical_kb.ingest_failures += 1
+    else:
+        for pdf_path, source_name in documents:
+            print(f"📖 Processing {source_name} from {pdf_path}")
+            enqueue(clinical_kb.extract_pdf_guidelines(pdf_path, source_name))
 
-def load_pdf_guidelines(guidelines_dir: str):
-    """Load all PDF guidelines from directory"""
-    pdf_files = [f for f in os.listdir(guidelines_dir) if f.endswith('.pdf')]
+    guidelines_added += clinical_kb.add_guidelines(pending, batch_size)
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(guidelines_dir, pdf_file)
-        source_name = pdf_file.replace('.pdf', '').replace('_', ' ').title()
-        clinical_kb.process_pdf_guidelines(pdf_path, source_name)
+    print(f"✅ Added {guidelines_added} guidelines from {len(documents)} PDFs")
+    report_ingest_rate(guidelines_added, time.perf_counter() - start)
+
+    return guidelines_added
+
+def load_ingest_manifest(manifest_path: Optional[str]) -> Dict:
+    """Read the ingestion manifest, treating a missing or corrupt file as empty"""
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Could not read ingestion manifest, re-ingesting: {e}")
+        return {}
+
+def save_ingest_manifest(manifest_path: Optional[str], manifest: Dict):
+    """Atomically write the ingestion manifest"""
+    if not manifest_path:
+        return
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'files': manifest}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+@contextmanager
+def _ingest_lock(manifest_path: Optional[str]):
+    """Serialize ingestion across processes sharing the same clinical database"""
+    if not manifest_path or fcntl is None:
+        yield
+        return
+
+    with open(f"{manifest_path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def guideline_source_name(pdf_file: str) -> str:
+    """Derive a display source name from a PDF file name"""
+    return pdf_file.replace('.pdf', '').replace('_', ' ').title()
+
+# Parser of a pool worker process, created once by its initializer
+_pdf_worker = {'kb': None}
+
+def _init_pdf_worker():
+    """Pool initializer: build the worker's parser once; it never loads the encoder"""
+    _pdf_worker['kb'] = ClinicalKnowledgeBase()
+
+def _extract_pdf_worker(pdf_path: str, source_name: str) -> List[ClinicalGuideline]:
+    """Parse one PDF in a pool worker (module level so it can be pickled)"""
+    print(f"📖 Processing {source_name} from {pdf_path}")
+    kb = _pdf_worker['kb'] or ClinicalKnowledgeBase()
+    return kb.extract_pdf_guidelines(pdf_path, source_name)
+
+def report_ingest_rate(sections: int, elapsed: float):
+    """Print ingestion throughput in sections per second"""
+    rate = sections / elapsed if elapsed > 0 else 0.0
+    print(f"⚡ Ingested {sections} sections in {elapsed:.1f}s ({rate:.1f} sections/s)")
 
 def get_clinical_ai() -> ClinicalAIAssistant:
     """Get clinical AI instance"""
@@ -0,0 +1,193 @@
+"""
+Sentence encoders for Bloom Clinical AI
+Runs all-MiniLM-L6-v2 either through sentence-transformers (PyTorch) or as
+an exported ONNX graph on ONNX Runtime, behind the same encode() call
+"""
+
+import os
+import shutil
+from typing import Dict, Tuple
+
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_DIMENSIONS = 384
+
+# Matches the max_seq_length sentence-transformers uses for this model
+MAX_SEQ_LENGTH = 256
+
+# Encoded by both backends at export time and checked again on every load
+PARITY_SENTENCES = [
+    'severe burnout high stress overwhelming fatigue',
+    'moderate burnout workplace stress',
+    'burnout prevention workplace wellbeing',
+    'Cochrane review of cognitive behavioural therapy for adjustment disorder',
+    'Gradual return to work with modified duties and regular follow-up assessments.',
+    'I have been sleeping badly and feel exhausted before the week even starts'
+]
+
+# Lowest cosine similarity to the PyTorch embeddings an exported model may reach
+PARITY_MIN_COSINE = {'fp32': 0.9999, 'int8': 0.98}
+
+class OnnxSentenceEncoder:
+    """MiniLM on ONNX Runtime with sentence-transformers' mean pooling and normalization
+
+    Model directory layout:
+      model.onnx      - transformer exported from PyTorch (fp32)
+      model.int8.onnx - dynamically quantized copy (int8 weights)
+      tokenizer.json  - the model's fast tokenizer
+      parity.npz      - PyTorch embeddings of PARITY_SENTENCES
+    """
+
+    def __init__(self, model_dir: str, threads: int = 1, quantize: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.threads = max(1, threads)
+        self.precision = 'int8' if quantize else 'fp32'
+        self.parity = None
+
+        # One intra-op pool per session; gunicorn workers must not oversubscribe cores
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        model_file = 'model.int8.onnx' if quantize else 'model.onnx'
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Normalized float32 embeddings, shaped like SentenceTransformer.encode"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), max(1, batch_size)):
+            encodings = self.tokenizer.encode_batch(list(sentences[start:start + batch_size]))
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean over real tokens, then unit length: the model's pooling and Normalize modules
+            weights = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+
+        embeddings = np.vstack(batches).astype(np.float32) if batches else np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    def check_parity(self) -> Dict:
+        """Compare embeddings of PARITY_SENTENCES with the stored PyTorch ones"""
+        with np.load(os.path.join(self.model_dir, 'parity.npz')) as data:
+            reference = data['embeddings']
+        parity = parity_report(self.encode(PARITY_SENTENCES), reference)
+        parity['min_required'] = PARITY_MIN_COSINE[self.precision]
+        self.parity = parity
+        return parity
+
+def parity_report(embeddings: np.ndarray, reference: np.ndarray) -> Dict:
+    """Row-wise cosine similarity and largest absolute difference between two embedding sets"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    reference = np.asarray(reference, dtype=np.float32)
+    cosine = (embeddings * reference).sum(axis=1) / np.maximum(
+        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1), 1e-12)
+    return {
+        'sentences': int(len(cosine)),
+        'min_cosine': round(float(cosine.min()), 6),
+        'mean_cosine': round(float(cosine.mean()), 6),
+        'max_abs_diff': round(float(np.abs(embeddings - reference).max()), 6)
+    }
+
+def export_onnx_model(model_dir: str):
+    """Export the PyTorch model, its tokenizer, parity embeddings and an int8 copy
+
+    Needs torch, sentence-transformers, onnx and onnxruntime once; serving
+    afterwards needs only onnxruntime and tokenizers.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    print(f"📦 Exporting {MODEL_NAME} to ONNX...")
+    model = SentenceTransformer(MODEL_NAME, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    staging = f"{model_dir}.exporting-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    try:
+        sample = tokenizer(PARITY_SENTENCES[:2], padding=True, return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                os.path.join(staging, 'model.onnx'),
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        quantize_dynamic(os.path.join(staging, 'model.onnx'), os.path.join(staging, 'model.int8.onnx'),
+                         weight_type=QuantType.QInt8)
+        tokenizer.backend_tokenizer.save(os.path.join(staging, 'tokenizer.json'))
+        np.savez(os.path.join(staging, 'parity.npz'),
+                 embeddings=model.encode(PARITY_SENTENCES, convert_to_numpy=True, show_progress_bar=False))
+
+        # Another worker may have finished the same export first; keep theirs
+        try:
+            os.rename(staging, model_dir)
+        except OSError:
+            if not os.path.exists(os.path.join(model_dir, 'model.onnx')):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    print(f"✅ ONNX model exported to {model_dir}")
+
+def load_encoder(backend: str, model_dir: str, threads: int = 1, quantize: bool = True) -> Tuple[object, Dict]:
+    """Encoder for the requested backend, falling back to PyTorch, and a description of it
+
+    The ONNX model is exported on first use and must pass the parity check
+    against the PyTorch embeddings before it is used.
+    """
+    if backend == 'onnx':
+        try:
+            if not os.path.exists(os.path.join(model_dir, 'parity.npz')):
+                export_onnx_model(model_dir)
+
+            encoder = OnnxSentenceEncoder(model_dir, threads=threads, quantize=quantize)
+            parity = encoder.check_parity()
+            if parity['min_cosine'] < parity['min_required']:
+                raise RuntimeError(f"parity check failed (min cosine {parity['min_cosine']})")
+
+            print(f"⚡ ONNX encoder ready ({encoder.precision}, {encoder.threads} thread(s), "
+                  f"min cosine {parity['min_cosine']})")
+            return encoder, {'backend': 'onnx', 'precision': encoder.precision,
+                             'threads': encoder.threads, 'parity': parity}
+        except ImportError as e:
+            print(f"⚠️  Warning: ONNX encoder needs requirements-onnx.txt ({e}), using PyTorch")
+        except Exception as e:
+            print(f"⚠️  Warning: ONNX encoder unavailable, using PyTorch: {e}")
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME), {'backend': 'torch'}
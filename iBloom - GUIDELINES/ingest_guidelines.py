@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Offline guideline ingestion for Bloom Clinical AI
+Parses PDF guidelines in parallel and writes their embeddings to the
+clinical database without going through the Flask boot path
+"""
+
+import os
+import sys
+import argparse
+from types import SimpleNamespace
+from clinical_ai import clinical_kb, load_pdf_guidelines, INGEST_BATCH_SIZE
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Ingest PDF clinical guidelines into the Bloom knowledge base')
+    parser.add_argument('--instance-path', default='instance',
+                        help='Flask instance folder holding clinical_db (default: instance)')
+    parser.add_argument('--guidelines-dir', default=None,
+                        help='Directory with PDF guidelines (default: <instance-path>/guidelines)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes used to parse PDFs (default: number of CPU cores)')
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE,
+                        help=f'Sections embedded and written per batch (default: {INGEST_BATCH_SIZE})')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-ingest every PDF even if the manifest says it is unchanged')
+    return parser.parse_args()
+
+def main():
+    """Run a full ingestion pass"""
+    args = parse_args()
+
+    instance_path = os.path.abspath(args.instance_path)
+    guidelines_dir = args.guidelines_dir or os.path.join(instance_path, 'guidelines')
+
+    print("🌸 Bloom Clinical Guideline Ingestion")
+    print("=" * 50)
+
+    if not os.path.isdir(guidelines_dir):
+        print(f"📁 Guidelines directory not found: {guidelines_dir}")
+        return 1
+
+    # The knowledge base only needs an object exposing instance_path
+    clinical_kb.init_app(SimpleNamespace(instance_path=instance_path))
+    if clinical_kb.collection is None:
+        print("❌ Clinical knowledge base could not be initialized")
+        return 1
+
+    load_pdf_guidelines(guidelines_dir, batch_size=args.batch_size, workers=args.workers, force=args.force)
+
+    print(f"📚 Clinical database now holds {clinical_kb.collection.count()} guidelines")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Lexical guideline index for Bloom Clinical AI
+Keeps guideline text in a SQLite FTS5 table next to the vector store so
+exact clinical terms (drug names, "Cochrane", diagnoses) are matched with
+BM25 instead of relying on embeddings alone
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+# Metadata columns a delete filter may use, matching ChromaDB's where clauses
+FILTER_COLUMNS = ('source', 'source_file')
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by can for from has have in is it may of on or
+should such than that the their there these this to was were which with
+""".split())
+
+# Constant of reciprocal-rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+
+def match_expression(query: str, operator: str = 'AND') -> Optional[str]:
+    """FTS5 MATCH expression with every query word quoted, so user text never parses as syntax"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(query.lower()):
+        if token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    if not terms:
+        return None
+    return f" {operator} ".join(f'"{term}"' for term in terms)
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], n_results: int, k: int = RRF_K) -> List[Dict]:
+    """Merge ranked guideline lists; relevance_score becomes the summed 1 / (k + rank)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, guideline in enumerate(ranking, start=1):
+            entry = fused.setdefault(guideline['content'], dict(guideline, relevance_score=0.0))
+            entry['relevance_score'] += 1.0 / (k + rank)
+
+    ordered = sorted(fused.values(), key=lambda guideline: guideline['relevance_score'], reverse=True)
+    return ordered[:n_results]
+
+class LexicalIndex:
+    """BM25 full-text search over guideline sections in SQLite FTS5
+
+    Each thread (and each forked worker) gets its own connection; SQLite
+    serializes writers, so ingestion and request threads can share the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS guidelines USING fts5("
+            "id UNINDEXED, content, topic, source UNINDEXED, source_file UNINDEXED, "
+            "metadata UNINDEXED, tokenize='porter unicode61')"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def count(self) -> int:
+        return self._connection().execute('SELECT count(*) FROM guidelines').fetchone()[0]
+
+    def ids(self) -> List[str]:
+        return [row[0] for row in self._connection().execute('SELECT id FROM guidelines')]
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict], replace_all: bool = False):
+        """Replace the rows of the given guideline IDs (or every row) in one transaction"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if replace_all:
+                connection.execute('DELETE FROM guidelines')
+            connection.executemany('DELETE FROM guidelines WHERE id = ?', [(guideline_id,) for guideline_id in ids])
+            connection.executemany(
+                'INSERT INTO guidelines (id, content, topic, source, source_file, metadata) VALUES (?, ?, ?, ?, ?, ?)',
+                [(guideline_id, document, metadata.get('topic', ''), metadata.get('source', ''),
+                  metadata.get('source_file', ''), json.dumps(metadata))
+                 for guideline_id, document, metadata in zip(ids, documents, metadatas)]
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def delete(self, where: Dict):
+        """Delete rows matching an equality filter on source or source_file"""
+        unknown = set(where) - set(FILTER_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unsupported lexical index filter: {sorted(unknown)}")
+        clause = ' AND '.join(f'{column} = ?' for column in where)
+        self._connection().execute(f'DELETE FROM guidelines WHERE {clause}', list(where.values()))
+
+    def rebuild_from_collection(self, collection) -> int:
+        """Replace the index contents with every guideline in a ChromaDB collection"""
+        data = collection.get(include=['documents', 'metadatas'])
+        self.upsert(data['ids'], data['documents'] or [], data['metadatas'] or [], replace_all=True)
+        return len(data['ids'])
+
+    def search(self, query: str, n_results: int, operator: str = 'AND') -> List[Dict]:
+        """Best BM25 matches for the query words, shaped like ChromaDB results"""
+        expression = match_expression(query, operator)
+        if expression is None or n_results <= 0:
+            return []
+
+        rows = self._connection().execute(
+            'SELECT content, metadata, bm25(guidelines) AS score FROM guidelines '
+            'WHERE guidelines MATCH ? ORDER BY score LIMIT ?',
+            (expression, n_results)
+        ).fetchall()
+
+        # bm25() is lower-is-better; flip it so higher means more relevant
+        return [{'content': content, 'metadata': json.loads(metadata), 'relevance_score': -score}
+                for content, metadata, score in rows]
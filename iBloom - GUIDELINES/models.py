@@ -16,6 +16,11 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_active = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Check-in streak, maintained at submit time
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_check_in_date = db.Column(db.Date, nullable=True)
+
     # Relationships
     responses = db.relationship('DailyResponse', backref='user', lazy=True, cascade='all, delete-orphan')
 
@@ -38,20 +43,30 @@ class DailyResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
 
-    # Raw questionnaire data
-    questions = db.Column(db.Text, nullable=False)  # JSON string of questions asked
-    responses = db.Column(db.Text, nullable=False)  # JSON string of user responses
+    # Raw questionnaire data (deferred 'payload' group: loaded together on first access)
+    questions = db.deferred(db.Column(db.Text, nullable=False), group='payload')  # JSON string of questions asked
+    responses = db.deferred(db.Column(db.Text, nullable=False), group='payload')  # JSON string of user responses
 
     # AI analysis results
     burnout_score = db.Column(db.Float, nullable=True, index=True)
-    ai_analysis = db.Column(db.Text, nullable=True)  # JSON string of full AI analysis
+    ai_analysis = db.deferred(db.Column(db.Text, nullable=True), group='payload')  # JSON string of full AI analysis
     concerns = db.Column(db.Text, nullable=True)  # JSON array of identified concerns
     recommendations = db.Column(db.Text, nullable=True)  # JSON array of recommendations
     urgency_level = db.Column(db.String(20), nullable=True, index=True)  # low, medium, high
+    analysis_status = db.Column(db.String(20), nullable=False, default='complete', index=True)  # pending, processing, complete, failed
 
     # Metadata
     response_time_seconds = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    analyzed_at = db.Column(db.DateTime, nullable=True)
+
+    # Normalized copies of the JSON columns
+    items = db.relationship('ResponseItem', backref='response', lazy=True,
+                            cascade='all, delete-orphan', order_by='ResponseItem.position')
+    concern_rows = db.relationship('ResponseConcern', backref='response', lazy=True, cascade='all, delete-orphan')
+    recommendation_rows = db.relationship('ResponseRecommendation', backref='response', lazy=True,
+                                          cascade='all, delete-orphan', order_by='ResponseRecommendation.position')
+    category_scores = db.relationship('CategoryScore', backref='response', lazy=True, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Response {self.id} - Score: {self.burnout_score}>'
@@ -78,12 +93,73 @@ class DailyResponse(db.Model):
             'concerns': json.loads(self.concerns) if self.concerns else [],
             'recommendations': json.loads(self.recommendations) if self.recommendations else [],
             'created_at': self.created_at.isoformat(),
-            'responses': self.get_responses_dict()
+            'responses': self.get_responses_dict(),
+            'analysis_status': self.analysis_status
         }
 
+class ResponseItem(db.Model):
+    """One answered question of a daily response"""
+    __tablename__ = 'response_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    category = db.Column(db.String(100), nullable=True, index=True)
+    question_type = db.Column(db.String(20), nullable=True)  # scale, text
+    question = db.Column(db.Text, nullable=True)
+    answer = db.Column(db.Text, nullable=True)
+    numeric_value = db.Column(db.Float, nullable=True)  # parsed answer for scale questions
+
+    def __repr__(self):
+        return f'<ResponseItem {self.response_id}:{self.position} {self.category}>'
+
+class ResponseConcern(db.Model):
+    """One concern identified in a daily response"""
+    __tablename__ = 'response_concerns'
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    concern = db.Column(db.String(255), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ResponseConcern {self.response_id} {self.concern}>'
+
+class ResponseRecommendation(db.Model):
+    """One recommendation given for a daily response"""
+    __tablename__ = 'response_recommendations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.Text, nullable=False)
+    rec_type = db.Column(db.String(50), nullable=True)
+    priority = db.Column(db.String(20), nullable=True)
+    evidence_based = db.Column(db.Boolean, default=False)
+    evidence_basis = db.Column(db.String(255), nullable=True)
+    rationale = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<ResponseRecommendation {self.response_id}:{self.position}>'
+
+class CategoryScore(db.Model):
+    """Scale answer value per question category, for progress metrics"""
+    __tablename__ = 'category_scores'
+    __table_args__ = (db.Index('ix_category_scores_user_category_created', 'user_id', 'category', 'created_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    response_id = db.Column(db.Integer, db.ForeignKey('daily_responses.id'), nullable=False, index=True)
+    category = db.Column(db.String(100), nullable=False)
+    value = db.Column(db.Float, nullable=False)  # 1-10 scale answer as given
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CategoryScore {self.category}={self.value}>'
+
 class CompanyMetrics(db.Model):
     """Aggregated company-level analytics (no individual data)"""
     __tablename__ = 'company_metrics'
+    __table_args__ = (db.UniqueConstraint('company_id', 'date', name='uq_company_metrics_day'),)
 
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.String(100), nullable=False, index=True)
@@ -98,9 +174,29 @@ class CompanyMetrics(db.Model):
 
     # Department breakdown (JSON)
     department_metrics = db.Column(db.Text, nullable=True)
-    common_concerns = db.Column(db.Text, nullable=True)  # JSON array of top concerns
+    common_concerns = db.Column(db.Text, nullable=True)  # JSON object of concern counts
+
+    # Highest response id included when this day was rolled up
+    last_response_id = db.Column(db.Integer, nullable=True)
+    # Highest response id that existed at that rollup; above last_response_id
+    # when analyses still pending held the day back
+    snapshot_id = db.Column(db.Integer, nullable=True)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Metrics {self.company_id} - {self.date}>'
+
+class GeneratedContent(db.Model):
+    """Cached LLM generations shared by users with the same prompt inputs"""
+    __tablename__ = 'generation_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), nullable=False, index=True)  # SHA-256 of prompt inputs
+    kind = db.Column(db.String(20), nullable=False)  # scale_questions, open_questions
+    content = db.Column(db.Text, nullable=False)  # JSON string of generated items
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
-        return f'<Metrics {self.company_id} - {self.date}>'
\ No newline at end of file
+        return f'<GeneratedContent {self.kind} {self.cache_key[:8]}...>'
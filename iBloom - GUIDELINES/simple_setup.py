@@ -140,15 +140,39 @@ Minimal Clinical AI Module for Bloom App
 Works without sentence-transformers to avoid dependency conflicts
 """
 
+import heapq
 import json
+import math
 import os
+import re
+from collections import Counter
 from pathlib import Path
 from typing import Dict, List
 
+# BM25 term-frequency saturation and document-length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by can for from has have in is it may of on or
+should such than that the their there these this to was were which with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
 class SimpleClinicalKnowledgeBase:
     def __init__(self):
         self.guidelines = {}
         self.loaded = False
+
+        # Inverted index over every guideline section, built by load_guidelines
+        self.documents = []
+        self.postings = {}
+        self.doc_lengths = []
+        self.avg_doc_length = 0.0
     
     def init_app(self, app):
         """Initialize with Flask app"""
@@ -185,38 +209,59 @@ class SimpleClinicalKnowledgeBase:
                 print(f"📚 Loaded: {data['topic']}")
             except Exception as e:
                 print(f"⚠️  Could not load {json_file}: {e}")
-    
-    def query_guidelines(self, query: str, n_results: int = 3) -> List[Dict]:
-        """Simple keyword-based guideline matching"""
-        if not self.guidelines:
-            return []
         
-        query_lower = query.lower()
-        relevant_guidelines = []
+        self.build_index()
+    
+    def build_index(self):
+        """Tokenize every guideline section into postings lists of (document, term frequency)"""
+        self.documents = []
+        self.postings = {}
+        self.doc_lengths = []
         
         for topic, guideline_data in self.guidelines.items():
             for guideline in guideline_data['guidelines']:
-                content = guideline['content'].lower()
+                doc_id = len(self.documents)
+                self.documents.append({
+                    'content': guideline['content'],
+                    'metadata': {
+                        'source': guideline_data['source'],
+                        'topic': topic,
+                        'section': guideline['section'],
+                        'evidence_level': guideline['evidence_level']
+                    }
+                })
                 
-                # Simple keyword matching
-                keywords = ['burnout', 'stress', 'fatigue', 'depression', 'anxiety', 'work', 'workplace']
-                matches = sum(1 for keyword in keywords if keyword in query_lower and keyword in content)
-                
-                if matches > 0:
-                    relevant_guidelines.append({
-                        'content': guideline['content'],
-                        'metadata': {
-                            'source': guideline_data['source'],
-                            'topic': topic,
-                            'section': guideline['section'],
-                            'evidence_level': guideline['evidence_level']
-                        },
-                        'relevance_score': matches / len(keywords)
-                    })
+                # The section title is indexed with the text it heads
+                tokens = tokenize(f"{guideline['section']} {guideline['content']}")
+                self.doc_lengths.append(len(tokens))
+                for term, frequency in Counter(tokens).items():
+                    self.postings.setdefault(term, []).append((doc_id, frequency))
+        
+        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        print(f"🔎 Indexed {len(self.documents)} guideline sections ({len(self.postings)} terms)")
+    
+    def query_guidelines(self, query: str, n_results: int = 3) -> List[Dict]:
+        """BM25 keyword search over the inverted index"""
+        if not self.documents or n_results <= 0:
+            return []
+        
+        total_docs = len(self.documents)
+        scores = {}
+        
+        # Only the postings of the query terms are visited
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / self.avg_doc_length
+                score = idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
         
-        # Sort by relevance and return top results
-        relevant_guidelines.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return relevant_guidelines[:n_results]
+        best = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+        return [dict(self.documents[doc_id], relevance_score=round(score, 4)) for doc_id, score in best]
     
     def get_clinical_context(self, user_responses: Dict, burnout_score: float) -> str:
         """Build clinical context for analysis"""
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Behavior tests for queued submissions (SUBMIT_MODE=queue)
+Runs against a throwaway SQLite database: python -m unittest test_analysis_queue
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+# The app reads its configuration at import time
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bloom_test.db'))
+os.environ.setdefault('CLINICAL_AI_INIT', 'background')
+os.environ.setdefault('OPENAI_API_KEY', '')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as bloom
+from app import app, db, DailyResponse
+
+QUESTIONS = [
+    {'id': 'energy', 'question': 'How would you rate your energy today?', 'type': 'scale', 'category': 'energy'},
+    {'id': 'stress', 'question': 'How stressed do you feel?', 'type': 'scale', 'category': 'stress'},
+    {'id': 'notes', 'question': 'Anything else on your mind?', 'type': 'text', 'category': 'open'}
+]
+RESPONSES = ['3', '8', 'Too many deadlines this week']
+
+ANALYSIS = {
+    'score': 72.5,
+    'urgency': 'high',
+    'concerns': ['workload'],
+    'recommendations': ['Take a proper lunch break'],
+    'summary': 'High stress driven by workload',
+    'clinical_sources': [],
+    'confidence': 0.8
+}
+
+class AnalysisQueueTest(unittest.TestCase):
+    def setUp(self):
+        app.config.update(TESTING=True, SUBMIT_MODE='queue', RESPONSE_STORAGE='json')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+        # Analyses are run by the test, not by the background pool
+        self.recover_pending_analyses = bloom.recover_pending_analyses
+        patches = [
+            mock.patch.object(bloom, 'enqueue_analysis'),
+            mock.patch.object(bloom, 'recover_pending_analyses')
+        ]
+        self.enqueue = patches[0].start()
+        patches[1].start()
+        for patch in patches:
+            self.addCleanup(patch.stop)
+
+        self.client = app.test_client()
+        self.assertEqual(self.client.post('/register', json={'company_id': 'acme', 'department': 'engineering'}).status_code, 200)
+
+    def submit(self):
+        return self.client.post('/api/submit', json={'questions': QUESTIONS, 'responses': RESPONSES})
+
+    def get_response(self, response_id):
+        with app.app_context():
+            # Payload columns are deferred; load them before the session closes
+            return DailyResponse.query.options(db.undefer_group('payload')).filter_by(id=response_id).one()
+
+    def test_submit_stores_pending_row_and_enqueues_it(self):
+        result = self.submit()
+
+        self.assertEqual(result.status_code, 202)
+        body = result.get_json()
+        self.assertEqual(body['status'], 'pending')
+        self.assertTrue(body['status_url'].endswith(f"/api/submissions/{body['response_id']}"))
+        self.enqueue.assert_called_once_with(body['response_id'])
+
+        row = self.get_response(body['response_id'])
+        self.assertEqual(row.analysis_status, 'pending')
+        self.assertIsNotNone(row.burnout_score)
+        self.assertEqual(json.loads(row.responses), RESPONSES)
+
+    def test_processing_completes_the_row_and_status_reports_it(self):
+        response_id = self.submit().get_json()['response_id']
+        self.assertEqual(self.client.get(f'/api/submissions/{response_id}').get_json()['status'], 'pending')
+
+        with mock.patch.object(bloom, 'analyze_responses', return_value=dict(ANALYSIS)):
+            with app.app_context():
+                bloom.process_pending_analysis(response_id)
+
+        row = self.get_response(response_id)
+        self.assertEqual(row.analysis_status, 'complete')
+        self.assertEqual(row.burnout_score, ANALYSIS['score'])
+        self.assertEqual(row.urgency_level, 'high')
+        self.assertEqual(json.loads(row.concerns), ['workload'])
+        self.assertIsNotNone(row.analyzed_at)
+
+        status = self.client.get(f'/api/submissions/{response_id}').get_json()
+        self.assertEqual(status['status'], 'complete')
+        self.assertIn('analysis', status)
+
+    def test_a_response_is_analyzed_only_once(self):
+        response_id = self.submit().get_json()['response_id']
+
+        with mock.patch.object(bloom, 'analyze_responses', return_value=dict(ANALYSIS)) as analyze:
+            with app.app_context():
+                bloom.process_pending_analysis(response_id)
+                bloom.process_pending_analysis(response_id)
+
+        self.assertEqual(analyze.call_count, 1)
+
+    def test_failed_analysis_marks_the_row_failed(self):
+        response_id = self.submit().get_json()['response_id']
+
+        with mock.patch.object(bloom, 'analyze_responses', side_effect=RuntimeError('model unavailable')):
+            with app.app_context():
+                bloom.process_pending_analysis(response_id)
+
+        row = self.get_response(response_id)
+        self.assertEqual(row.analysis_status, 'failed')
+        self.assertEqual(self.client.get(f'/api/submissions/{response_id}').get_json()['status'], 'failed')
+
+    def test_recovery_requeues_pending_and_stale_processing_rows(self):
+        pending_id, stale_id, fresh_id = (self.submit().get_json()['response_id'] for _ in range(3))
+        with app.app_context():
+            DailyResponse.query.filter_by(id=stale_id).update({
+                'analysis_status': 'processing',
+                'analyzed_at': datetime.utcnow() - timedelta(minutes=app.config['ANALYSIS_STALE_MINUTES'] + 5)
+            })
+            DailyResponse.query.filter_by(id=fresh_id).update({
+                'analysis_status': 'processing',
+                'analyzed_at': datetime.utcnow()
+            })
+            db.session.commit()
+
+        self.enqueue.reset_mock()
+        with app.app_context():
+            self.recover_pending_analyses()
+
+        requeued = sorted(call.args[0] for call in self.enqueue.call_args_list)
+        self.assertEqual(requeued, sorted([pending_id, stale_id]))
+        self.assertEqual(self.get_response(stale_id).analysis_status, 'pending')
+        self.assertEqual(self.get_response(fresh_id).analysis_status, 'processing')
+
+    def test_status_is_private_to_the_submitting_user(self):
+        response_id = self.submit().get_json()['response_id']
+
+        other = app.test_client()
+        self.assertEqual(other.get(f'/api/submissions/{response_id}').status_code, 401)
+        other.post('/register', json={'company_id': 'acme'})
+        self.assertEqual(other.get(f'/api/submissions/{response_id}').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Behavior tests for check-in streaks kept on the users table
+Runs against a throwaway SQLite database: python -m unittest test_check_in_streaks
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+# The app reads its configuration at import time
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bloom_test.db'))
+os.environ.setdefault('CLINICAL_AI_INIT', 'background')
+os.environ.setdefault('OPENAI_API_KEY', '')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app as bloom
+from app import app, db, DailyResponse, User
+
+MONDAY = date(2026, 3, 2)
+
+class ApplyCheckInTest(unittest.TestCase):
+    def check_in(self, user, *days_from_monday):
+        for days in days_from_monday:
+            bloom.apply_check_in(user, MONDAY + timedelta(days=days))
+        return user.current_streak, user.longest_streak, user.last_check_in_date
+
+    def test_first_check_in_starts_a_streak(self):
+        self.assertEqual(self.check_in(User(), 0), (1, 1, MONDAY))
+
+    def test_next_day_extends_the_streak(self):
+        self.assertEqual(self.check_in(User(), 0, 1, 2), (3, 3, MONDAY + timedelta(days=2)))
+
+    def test_same_day_repeats_count_once(self):
+        self.assertEqual(self.check_in(User(), 0, 1, 1, 1), (2, 2, MONDAY + timedelta(days=1)))
+
+    def test_out_of_order_day_changes_nothing(self):
+        self.assertEqual(self.check_in(User(), 0, 1, 2, 0), (3, 3, MONDAY + timedelta(days=2)))
+
+    def test_missed_day_resets_but_keeps_the_longest_streak(self):
+        user = User()
+        self.check_in(user, 0, 1, 2)
+        # Thursday is missed
+        self.assertEqual(self.check_in(user, 4), (1, 3, MONDAY + timedelta(days=4)))
+        self.assertEqual(self.check_in(user, 5, 6, 7, 8), (5, 5, MONDAY + timedelta(days=8)))
+
+    def test_streak_is_alive_until_a_full_day_is_missed(self):
+        today = datetime.utcnow().date()
+        for last_check_in, expected in ((today, 4), (today - timedelta(days=1), 4), (today - timedelta(days=2), 0)):
+            user = User(current_streak=4, last_check_in_date=last_check_in)
+            self.assertEqual(bloom.active_streak(user), expected, last_check_in)
+        self.assertEqual(bloom.active_streak(User(current_streak=4)), 0)
+
+class StoredStreakTest(unittest.TestCase):
+    def setUp(self):
+        app.config.update(TESTING=True, SUBMIT_MODE='queue', RESPONSE_STORAGE='json')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def add_user(self, *days_ago):
+        """User with one response on each of the given days, streak columns left empty"""
+        with app.app_context():
+            user = User(company_id='acme', department='engineering')
+            db.session.add(user)
+            db.session.flush()
+            today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+            for days in days_ago:
+                db.session.add(DailyResponse(
+                    user_id=user.id, questions='[]', responses='[]', burnout_score=40,
+                    urgency_level='low', created_at=today_start - timedelta(days=days, hours=-9)
+                ))
+            db.session.commit()
+            return user.id
+
+    def get_user(self, user_id):
+        with app.app_context():
+            return db.session.get(User, user_id)
+
+    def test_submissions_advance_the_streak_once_per_day(self):
+        client = app.test_client()
+        client.post('/register', json={'company_id': 'acme', 'department': 'engineering'})
+        with client.session_transaction() as session:
+            user_id = session['user_id']
+        with app.app_context():
+            User.query.filter_by(id=user_id).update({
+                'current_streak': 2, 'longest_streak': 2,
+                'last_check_in_date': datetime.utcnow().date() - timedelta(days=1)
+            })
+            db.session.commit()
+
+        submission = {'questions': [{'id': 'stress', 'question': 'How stressed do you feel?',
+                                     'type': 'scale', 'category': 'stress'}], 'responses': ['8']}
+        with mock.patch.object(bloom, 'enqueue_analysis'):
+            for _ in range(2):
+                self.assertEqual(client.post('/api/submit', json=submission).status_code, 202)
+
+        user = self.get_user(user_id)
+        self.assertEqual((user.current_streak, user.longest_streak), (3, 3))
+        self.assertEqual(user.last_check_in_date, datetime.utcnow().date())
+
+    def test_backfill_rebuilds_streaks_from_response_days(self):
+        # Two responses yesterday, one each of the two days before, then a gap
+        continuing = self.add_user(1, 1, 2, 3, 6, 7, 8, 9)
+        lapsed = self.add_user(5, 6)
+        never = self.add_user()
+
+        with app.app_context():
+            self.assertEqual(bloom.backfill_check_in_streaks(batch_size=2), 3)
+
+        user = self.get_user(continuing)
+        self.assertEqual((user.current_streak, user.longest_streak), (3, 4))
+        self.assertEqual(user.last_check_in_date, datetime.utcnow().date() - timedelta(days=1))
+        self.assertEqual(bloom.active_streak(user), 3)
+
+        user = self.get_user(lapsed)
+        self.assertEqual((user.current_streak, user.longest_streak), (2, 2))
+        self.assertEqual(bloom.active_streak(user), 0)
+
+        user = self.get_user(never)
+        self.assertEqual((user.current_streak, user.longest_streak, user.last_check_in_date), (0, 0, None))
+
+if __name__ == '__main__':
+    unittest.main()
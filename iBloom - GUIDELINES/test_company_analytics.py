@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Behavior tests for company analytics and the CompanyMetrics rollup
+Runs against a throwaway SQLite database: python -m unittest test_company_analytics
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# The app reads its configuration at import time
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bloom_test.db'))
+os.environ.setdefault('CLINICAL_AI_INIT', 'background')
+os.environ.setdefault('OPENAI_API_KEY', '')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.exc import IntegrityError
+
+import app as bloom
+from app import app, db, CompanyMetrics, DailyResponse, User
+
+class CompanyAnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        # Rollups run only when a test asks for them
+        app.config.update(TESTING=True, METRICS_ROLLUP_INTERVAL=0, RESPONSE_STORAGE='json')
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            self.users = {}
+            for key, company, department in (('acme_eng', 'acme', 'engineering'),
+                                             ('acme_sales', 'acme', 'sales'),
+                                             ('globex_ops', 'globex', 'operations')):
+                user = User(company_id=company, department=department)
+                db.session.add(user)
+                db.session.flush()
+                self.users[key] = user.id
+            db.session.commit()
+
+        self.today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        self.minute = 0
+
+    def add_response(self, user, days_ago, score, urgency='medium', concerns=('workload',), status='complete'):
+        """Insert a response on a day relative to today, returning its id"""
+        self.minute += 1
+        with app.app_context():
+            response = DailyResponse(
+                user_id=self.users[user],
+                questions='[]',
+                responses='[]',
+                burnout_score=score,
+                urgency_level=urgency,
+                concerns=json.dumps(list(concerns)),
+                analysis_status=status,
+                created_at=self.today_start - timedelta(days=days_ago) + timedelta(hours=1, minutes=self.minute)
+            )
+            db.session.add(response)
+            db.session.commit()
+            return response.id
+
+    def rollup(self):
+        with app.app_context():
+            return bloom.rollup_company_metrics()
+
+    def watermarks(self):
+        with app.app_context():
+            return {(metrics.company_id, metrics.date): metrics.last_response_id
+                    for metrics in CompanyMetrics.query}
+
+    def analytics(self, company_id=None, period='7d', query=''):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['company_user'] = 'admin'
+            if company_id:
+                session['company_id'] = company_id
+        result = client.get(f'/api/company-analytics?period={period}{query}')
+        self.assertEqual(result.status_code, 200)
+        return result.get_json()
+
+    def expected(self, company_id=None, days=7):
+        """Totals straight from daily_responses for comparison"""
+        since = self.today_start - timedelta(days=days - 1)
+        with app.app_context():
+            query = db.session.query(db.func.count(DailyResponse.id), db.func.avg(DailyResponse.burnout_score)) \
+                .join(User, User.id == DailyResponse.user_id) \
+                .filter(DailyResponse.created_at >= since)
+            if company_id:
+                query = query.filter(User.company_id == company_id)
+            total, average = query.one()
+        return total, bloom.wellness_score(average)
+
+    def assert_matches_responses(self, company_id=None):
+        result = self.analytics(company_id)
+        total, wellness = self.expected(company_id)
+        self.assertEqual(result['total_responses'], total)
+        self.assertAlmostEqual(result['avg_wellness_score'], wellness, places=1)
+        return result
+
+    def test_closed_days_are_counted_before_any_rollup(self):
+        self.add_response('acme_eng', 3, 40)
+        self.add_response('acme_sales', 1, 60)
+        self.add_response('globex_ops', 0, 20)
+
+        result = self.assert_matches_responses()
+        self.assertEqual(result['total_responses'], 3)
+        self.assertEqual(len(result['trend_data']), 3)
+
+    def test_rollup_keeps_totals_and_late_rows_are_not_lost(self):
+        for days_ago, score in ((3, 40), (2, 55), (1, 70), (0, 30)):
+            self.add_response('acme_eng', days_ago, score)
+            self.add_response('globex_ops', days_ago, score / 2)
+        before = self.assert_matches_responses()
+
+        self.assertEqual(self.rollup(), 6)
+        self.assertEqual(len(self.watermarks()), 6)
+        self.assertEqual(self.assert_matches_responses()['total_responses'], before['total_responses'])
+
+        # A response landing on a rolled-up day is read live until the next run
+        self.add_response('acme_eng', 1, 90, urgency='high')
+        self.assertEqual(self.assert_matches_responses()['total_responses'], before['total_responses'] + 1)
+
+        self.assertEqual(self.rollup(), 1)
+        result = self.assert_matches_responses()
+        self.assertEqual(result['total_responses'], before['total_responses'] + 1)
+        self.assertEqual(result['high_risk_count'], 1)
+
+        # Nothing left to roll up
+        self.assertEqual(self.rollup(), 0)
+
+    def test_pending_row_holds_back_only_its_company_day(self):
+        self.add_response('acme_eng', 2, 50)
+        self.add_response('acme_eng', 1, 40)
+        pending_id = self.add_response('acme_sales', 1, 45, status='pending')
+        later_id = self.add_response('acme_eng', 1, 65)
+        globex_id = self.add_response('globex_ops', 1, 35)
+
+        self.rollup()
+        yesterday = (self.today_start - timedelta(days=1)).date()
+        two_days_ago = (self.today_start - timedelta(days=2)).date()
+        watermarks = self.watermarks()
+        self.assertEqual(watermarks[('acme', yesterday)], pending_id - 1)
+        self.assertEqual(watermarks[('acme', two_days_ago)], globex_id)
+        self.assertEqual(watermarks[('globex', yesterday)], globex_id)
+
+        # Rows above the held-back watermark, pending or not, are still counted
+        self.assert_matches_responses('acme')
+        self.assert_matches_responses()
+
+        with app.app_context():
+            DailyResponse.query.filter_by(id=pending_id).update({'analysis_status': 'complete', 'burnout_score': 85})
+            db.session.commit()
+        self.assert_matches_responses('acme')
+
+        self.rollup()
+        self.assertGreaterEqual(self.watermarks()[('acme', yesterday)], later_id)
+        self.assert_matches_responses('acme')
+        self.assert_matches_responses()
+
+    def test_live_part_reads_only_responses_past_the_rollups(self):
+        for days_ago in (5, 4, 3, 2, 1):
+            self.add_response('acme_eng', days_ago, 40)
+            self.add_response('globex_ops', days_ago, 60)
+        self.rollup()
+        late_id = self.add_response('acme_eng', 3, 80)
+        today_id = self.add_response('globex_ops', 0, 20)
+
+        with app.app_context():
+            bound = bloom.uncovered_bound()
+            live = {response_id for (response_id,) in db.session.query(DailyResponse.id).filter(bound)}
+        self.assertEqual(live, {late_id, today_id})
+        self.assert_matches_responses()
+
+    def test_held_back_day_stays_inside_the_bound(self):
+        self.add_response('acme_eng', 2, 40)
+        pending_id = self.add_response('acme_sales', 1, 45, status='pending')
+        self.add_response('globex_ops', 1, 35)
+        self.rollup()
+
+        with app.app_context():
+            bound = bloom.uncovered_bound('acme')
+            live = {response_id for (response_id,) in db.session.query(DailyResponse.id).filter(bound)}
+        self.assertIn(pending_id, live)
+        self.assert_matches_responses('acme')
+
+    def test_active_users_come_from_check_in_days(self):
+        self.add_response('acme_eng', 1, 40)
+        with app.app_context():
+            for key, days_ago in (('acme_eng', 1), ('acme_sales', 30)):
+                db.session.get(User, self.users[key]).last_check_in_date = (self.today_start - timedelta(days=days_ago)).date()
+            db.session.commit()
+
+        result = self.analytics('acme')
+        self.assertEqual(result['total_users'], 2)
+        self.assertEqual(result['active_users'], 1)
+        self.assertEqual(result['participation_rate'], 0.5)
+
+    def test_schema_upgrade_adds_the_unique_day_index(self):
+        with app.app_context():
+            # company_metrics as databases created before the rollup fixes have it
+            CompanyMetrics.__table__.drop(db.engine)
+            db.session.execute(db.text(
+                'CREATE TABLE company_metrics (id INTEGER PRIMARY KEY, company_id VARCHAR(100) NOT NULL, '
+                'date DATE NOT NULL, total_responses INTEGER, avg_burnout_score FLOAT, high_risk_count INTEGER, '
+                'medium_risk_count INTEGER, low_risk_count INTEGER, department_metrics TEXT, '
+                'common_concerns TEXT, created_at DATETIME)'
+            ))
+            for total in (3, 4):
+                db.session.execute(db.text(
+                    "INSERT INTO company_metrics (company_id, date, total_responses) VALUES ('acme', '2024-01-02', :total)"
+                ), {'total': total})
+            db.session.commit()
+
+            bloom.upgrade_schema()
+            bloom.upgrade_schema()
+
+            rows = db.session.execute(db.text('SELECT total_responses FROM company_metrics')).fetchall()
+            self.assertEqual(rows, [(4,)])
+            with self.assertRaises(IntegrityError):
+                db.session.execute(db.text(
+                    "INSERT INTO company_metrics (company_id, date, total_responses) VALUES ('acme', '2024-01-02', 1)"
+                ))
+            db.session.rollback()
+
+    def test_analytics_require_company_login(self):
+        self.add_response('acme_eng', 1, 40)
+        client = app.test_client()
+        self.assertEqual(client.get('/api/company-analytics?company_id=acme').status_code, 401)
+
+        client.post('/register', json={'company_id': 'acme'})
+        self.assertEqual(client.get('/api/company-analytics?company_id=acme').status_code, 401)
+
+    def test_company_comes_from_the_session_not_the_query_string(self):
+        self.add_response('acme_eng', 1, 40)
+        self.add_response('globex_ops', 1, 60)
+        self.add_response('globex_ops', 0, 60)
+
+        result = self.analytics('acme', query='&company_id=globex')
+        self.assertEqual(result['company_id'], 'acme')
+        self.assertEqual(result['total_responses'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Behavior tests for the company CSV export (/api/export-company-report)
+Runs against a throwaway SQLite database: python -m unittest test_company_export
+"""
+
+import os
+import csv
+import sys
+import gzip
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# The app reads its configuration at import time
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bloom_test.db'))
+os.environ.setdefault('CLINICAL_AI_INIT', 'background')
+os.environ.setdefault('OPENAI_API_KEY', '')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, DailyResponse, User
+
+class CompanyExportTest(unittest.TestCase):
+    def setUp(self):
+        app.config.update(TESTING=True, METRICS_ROLLUP_INTERVAL=0, RESPONSE_STORAGE='json', EXPORT_MIN_GROUP_SIZE=5)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        self.today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+
+    def add_team(self, company, department, size, days=(1,), score=40):
+        """Users of one department, each answering once on the given days"""
+        with app.app_context():
+            for _ in range(size):
+                user = User(company_id=company, department=department)
+                db.session.add(user)
+                db.session.flush()
+                for days_ago in days:
+                    db.session.add(DailyResponse(
+                        user_id=user.id, questions='[]', responses='[]', burnout_score=score,
+                        urgency_level='low', created_at=self.today_start - timedelta(days=days_ago, hours=-9)
+                    ))
+            db.session.commit()
+
+    def client_for(self, company_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['company_user'] = 'admin'
+            session['company_id'] = company_id
+        return client
+
+    def export(self, company_id='acme', **body):
+        result = self.client_for(company_id).post('/api/export-company-report', json=dict({'period': '30d'}, **body))
+        self.assertEqual(result.status_code, 200)
+        data = result.get_data()
+        if body.get('compress'):
+            data = gzip.decompress(data)
+        return list(csv.DictReader(data.decode('utf-8').splitlines()))
+
+    def test_export_requires_company_login(self):
+        self.assertEqual(app.test_client().post('/api/export-company-report', json={}).status_code, 401)
+
+    def test_export_is_limited_to_the_session_company(self):
+        self.add_team('acme', 'engineering', 6)
+        self.add_team('globex', 'operations', 6, score=80)
+
+        rows = self.export('acme')
+        self.assertTrue(rows)
+        self.assertEqual({row['department'] for row in rows}, {'engineering'})
+
+        # Naming another company in the body is refused, repeating your own is fine
+        client = self.client_for('acme')
+        self.assertEqual(client.post('/api/export-company-report', json={'company_id': 'globex'}).status_code, 403)
+        self.assertEqual(client.post('/api/export-company-report', json={'company_id': 'ACME'}).status_code, 200)
+
+    def test_small_departments_are_suppressed(self):
+        self.add_team('acme', 'engineering', 6)
+        self.add_team('acme', 'legal', 2)
+
+        rows = self.export()
+        self.assertEqual({row['department'] for row in rows}, {'engineering'})
+        aggregates = [row for row in rows if row['record_type'] == 'department_day']
+        self.assertEqual([row['responses'] for row in aggregates], ['6'])
+        self.assertEqual(len([row for row in rows if row['record_type'] == 'response']), 6)
+
+    def test_small_department_days_are_suppressed(self):
+        self.add_team('acme', 'engineering', 6, days=(1,))
+        # Only three of the team answered two days ago
+        self.add_team('acme', 'engineering', 3, days=(2,))
+
+        aggregates = [row for row in self.export() if row['record_type'] == 'department_day']
+        yesterday = (self.today_start - timedelta(days=1)).date().isoformat()
+        self.assertEqual([(row['date'], row['responses']) for row in aggregates], [(yesterday, '6')])
+
+    def test_pseudonyms_are_stable_within_an_export_only(self):
+        self.add_team('acme', 'engineering', 5, days=(1, 2))
+
+        first = [row['participant'] for row in self.export() if row['record_type'] == 'response']
+        second = [row['participant'] for row in self.export() if row['record_type'] == 'response']
+        self.assertEqual(len(set(first)), 5)
+        self.assertEqual(len(first), 10)
+        self.assertFalse(set(first) & set(second))
+
+    def test_gzip_export_matches_plain_export(self):
+        self.add_team('acme', 'engineering', 6, days=(1, 2))
+
+        def without_participants(rows):
+            return [dict(row, participant=bool(row['participant'])) for row in rows]
+
+        self.assertEqual(without_participants(self.export(compress=True)), without_participants(self.export()))
+
+if __name__ == '__main__':
+    unittest.main()
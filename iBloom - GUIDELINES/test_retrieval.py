@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Behavior tests for guideline retrieval: the NumPy and FTS5 indexes kept next to ChromaDB,
+rank fusion, the ONNX encoder fallback and incremental PDF ingestion
+Uses a small in-memory collection: python -m unittest test_retrieval
+"""
+
+import os
+import sys
+import types
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clinical_ai
+import encoders
+from clinical_ai import ClinicalKnowledgeBase
+from lexical_index import LexicalIndex, RRF_K, reciprocal_rank_fusion
+from vector_index import NumpyVectorIndex, ids_fingerprint, normalize_rows
+
+DIMENSIONS = 16
+
+def embed(text):
+    """Deterministic unit vector for a text, standing in for the sentence encoder"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in text.lower().split():
+        vector[sum(map(ord, word)) % DIMENSIONS] += 1.0
+    return vector / max(np.linalg.norm(vector), 1e-12)
+
+class FakeCollection:
+    """The parts of a ChromaDB collection the knowledge base reads"""
+
+    def __init__(self, guidelines=()):
+        self.rows = {}
+        for guideline_id, text in guidelines:
+            self.put(guideline_id, text)
+
+    def put(self, guideline_id, text, source='NICE'):
+        self.rows[guideline_id] = (embed(text), text, {'source': source, 'topic': 'burnout', 'page_number': 1})
+
+    def count(self):
+        return len(self.rows)
+
+    def query(self, query_embeddings, n_results):
+        ids = list(self.rows)
+        matrix = np.array([self.rows[i][0] for i in ids])
+        result = {'documents': [], 'metadatas': [], 'distances': []}
+        for embedding in query_embeddings:
+            distances = ((matrix - np.asarray(embedding)) ** 2).sum(axis=1)
+            order = np.argsort(distances)[:n_results]
+            result['documents'].append([self.rows[ids[row]][1] for row in order])
+            result['metadatas'].append([self.rows[ids[row]][2] for row in order])
+            result['distances'].append([float(distances[row]) for row in order])
+        return result
+
+    def get(self, include=None):
+        ids = list(self.rows)
+        return {
+            'ids': ids,
+            'embeddings': np.array([self.rows[i][0] for i in ids]).reshape(len(ids), DIMENSIONS),
+            'documents': [self.rows[i][1] for i in ids],
+            'metadatas': [self.rows[i][2] for i in ids]
+        }
+
+class FakeEncoder:
+    def encode(self, sentences, show_progress_bar=False, **kwargs):
+        return np.array([embed(sentence) for sentence in sentences])
+
+GUIDELINES = [
+    ('nice_1', 'Cognitive behavioural therapy is recommended for work related stress'),
+    ('nice_2', 'Graded return to work with regular review after burnout'),
+    ('nice_3', 'Sleep hygiene advice for insomnia caused by shift work'),
+]
+
+class RetrievalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.collection = FakeCollection(GUIDELINES)
+
+    def knowledge_base(self):
+        kb = ClinicalKnowledgeBase()
+        kb.persist_directory = self.directory
+        kb.collection = self.collection
+        return kb
+
+class LexicalIndexStalenessTest(RetrievalTestCase):
+    def replace_a_section(self):
+        """Re-ingestion of a changed PDF: same number of sections, new text and ID"""
+        del self.collection.rows['nice_3']
+        self.collection.put('nice_4', 'Mindfulness based stress reduction for anxious employees')
+
+    def test_open_rebuilds_an_index_with_the_same_count_but_other_ids(self):
+        kb = self.knowledge_base()
+        kb._open_lexical_index()
+        self.replace_a_section()
+
+        kb = self.knowledge_base()
+        kb._open_lexical_index()
+        self.assertEqual(len(kb.lexical_index.search('mindfulness', 3)), 1)
+        self.assertEqual(kb.lexical_index.search('insomnia', 3), [])
+
+    def test_open_keeps_a_current_index(self):
+        self.knowledge_base()._open_lexical_index()
+
+        with mock.patch.object(LexicalIndex, 'rebuild_from_collection') as rebuild:
+            kb = self.knowledge_base()
+            kb._open_lexical_index()
+        rebuild.assert_not_called()
+        self.assertEqual(kb.lexical_index.count(), len(GUIDELINES))
+
+    def test_dense_ingestion_refreshes_an_index_on_disk(self):
+        kb = self.knowledge_base()
+        kb._open_lexical_index()
+
+        # A dense-mode process (the ingestion CLI) has no lexical index of its own
+        writer = self.knowledge_base()
+        self.replace_a_section()
+        writer.refresh_lexical_index()
+
+        self.assertEqual(len(kb.lexical_index.search('mindfulness', 3)), 1)
+        self.assertEqual(kb.lexical_index.search('insomnia', 3), [])
+
+class HybridRoutingTest(RetrievalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collection = FakeCollection(
+            [(f'general_{i}', f'Workplace stress guidance section {i} on workload and support') for i in range(50)] +
+            [(f'lithium_{i}', f'Lithium monitoring for bipolar disorder during workplace stress, note {i}') for i in range(4)]
+        )
+        self.kb = self.knowledge_base()
+        self.kb.encoder = FakeEncoder()
+        self.kb._open_lexical_index()
+        patch = mock.patch('clinical_ai.LEXICAL_SHORTCUT_MAX_SHARE', 0.1)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_specific_terms_are_answered_by_the_lexical_lane(self):
+        results = self.kb._search_many(['lithium'], 3)[0]
+        self.assertEqual(self.kb.retrieval_counts, {'lexical': 1, 'fused': 0})
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all('Lithium' in result['content'] for result in results))
+
+    def test_common_words_are_fused_with_dense_retrieval(self):
+        # Every query word appears in all 54 sections; a row count alone would have taken the shortcut
+        self.kb._search_many(['workplace stress'], 3)
+        self.assertEqual(self.kb.retrieval_counts, {'lexical': 0, 'fused': 1})
+
+    def test_too_few_matches_are_fused_with_dense_retrieval(self):
+        self.kb._search_many(['lithium bipolar clozapine'], 3)
+        self.assertEqual(self.kb.retrieval_counts, {'lexical': 0, 'fused': 1})
+
+    def test_every_hybrid_path_scores_by_reciprocal_rank(self):
+        top_score = 2.0 / (RRF_K + 1)
+        for query in ('lithium', 'workplace stress'):
+            scores = [result['relevance_score'] for result in self.kb._search_many([query], 3)[0]]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+            self.assertTrue(all(0 < score <= top_score for score in scores), (query, scores))
+
+def random_index_data(rows=300, seed=7):
+    """Random unit embeddings with matching documents, metadata and IDs"""
+    matrix = normalize_rows(np.random.default_rng(seed).standard_normal((rows, DIMENSIONS)).astype(np.float32))
+    documents = [f'section {row}' for row in range(rows)]
+    metadatas = [{'source': 'NICE', 'page_number': row} for row in range(rows)]
+    return matrix, documents, metadatas, [f'nice_{row}' for row in range(rows)]
+
+class VectorIndexTest(RetrievalTestCase):
+    def build(self, dtype='float32', rows=300):
+        matrix, documents, metadatas, ids = random_index_data(rows)
+        index = NumpyVectorIndex(os.path.join(self.directory, 'vector_index'), dtype=dtype)
+        index.build(matrix, documents, metadatas, ids=ids)
+        return index, matrix
+
+    def test_float32_search_matches_brute_force(self):
+        index, matrix = self.build()
+        queries = np.random.default_rng(1).standard_normal((5, DIMENSIONS)).astype(np.float32)
+
+        for query, results in zip(queries, index.search(queries, 5)):
+            expected = np.argsort(-(matrix @ query))[:5]
+            self.assertEqual([result['content'] for result in results], [f'section {row}' for row in expected])
+            self.assertEqual(results[0]['metadata']['page_number'], int(expected[0]))
+
+    def test_quantized_scan_is_rescored_in_full_precision(self):
+        queries = np.random.default_rng(2).standard_normal((20, DIMENSIONS)).astype(np.float32)
+        exact, _ = self.build('float32')
+        exact_top = [results[0]['content'] for results in exact.search(queries, 3)]
+
+        for dtype in ('float16', 'int8'):
+            index, _ = self.build(dtype)
+            recall = index.recall_at_k(queries, 3)
+            self.assertGreaterEqual(recall['recall_rescored'], recall['recall'], dtype)
+            self.assertEqual(recall['recall_rescored'], 1.0, dtype)
+            self.assertEqual([results[0]['content'] for results in index.search(queries, 3)], exact_top, dtype)
+            self.assertLess(index.stats()['scan_bytes'], index.stats()['full_precision_bytes'])
+
+    def test_fingerprint_covers_ids_and_storage_mode(self):
+        index, _ = self.build()
+        ids = random_index_data()[3]
+        self.assertTrue(index.is_current(ids_fingerprint(list(reversed(ids)))))
+        # Same number of rows, one section replaced
+        self.assertFalse(index.is_current(ids_fingerprint(ids[:-1] + ['nice_new'])))
+
+        reopened = NumpyVectorIndex(index.path, dtype='int8')
+        reopened.load()
+        self.assertFalse(reopened.is_current(ids_fingerprint(ids)))
+
+    def test_open_rebuilds_an_index_with_the_same_count_but_other_ids(self):
+        kb = self.knowledge_base()
+        kb._open_vector_index()
+        del self.collection.rows['nice_3']
+        self.collection.put('nice_4', 'Mindfulness based stress reduction for anxious employees')
+
+        kb = self.knowledge_base()
+        kb._open_vector_index()
+        contents = [result['content'] for result in kb.vector_index.search([embed('mindfulness')], 3)[0]]
+        self.assertIn('Mindfulness based stress reduction for anxious employees', contents)
+        self.assertNotIn(GUIDELINES[2][1], contents)
+
+    def test_open_keeps_a_current_index(self):
+        self.knowledge_base()._open_vector_index()
+
+        with mock.patch.object(NumpyVectorIndex, 'build') as build:
+            kb = self.knowledge_base()
+            kb._open_vector_index()
+        build.assert_not_called()
+        self.assertEqual(len(kb.vector_index), len(GUIDELINES))
+
+    def test_search_picks_up_a_rebuild_from_another_process(self):
+        reader, _ = self.build(rows=10)
+        self.assertEqual(len(reader.search([np.ones(DIMENSIONS)], 20)[0]), 10)
+
+        self.build(rows=12)
+        self.assertEqual(len(reader.search([np.ones(DIMENSIONS)], 20)[0]), 12)
+
+class ReciprocalRankFusionTest(unittest.TestCase):
+    @staticmethod
+    def ranking(*contents):
+        return [{'content': content, 'metadata': {}, 'relevance_score': 0.9} for content in contents]
+
+    def test_guidelines_found_by_both_lanes_rank_first(self):
+        fused = reciprocal_rank_fusion([self.ranking('a', 'b', 'c'), self.ranking('d', 'c', 'e')], 5)
+        self.assertEqual([guideline['content'] for guideline in fused], ['c', 'a', 'd', 'b', 'e'])
+
+    def test_scores_are_summed_reciprocal_ranks(self):
+        fused = reciprocal_rank_fusion([self.ranking('a', 'b'), self.ranking('b')], 2, k=10)
+        self.assertEqual([(guideline['content'], guideline['relevance_score']) for guideline in fused],
+                         [('b', 1 / 12 + 1 / 11), ('a', 1 / 11)])
+
+    def test_results_are_cut_to_n_results(self):
+        fused = reciprocal_rank_fusion([self.ranking('a', 'b', 'c'), self.ranking('c', 'd')], 2)
+        self.assertEqual([guideline['content'] for guideline in fused], ['c', 'a'])
+        self.assertEqual(reciprocal_rank_fusion([], 3), [])
+
+class OnnxEncoderFallbackTest(RetrievalTestCase):
+    def setUp(self):
+        super().setUp()
+        # An exported model: load_encoder only exports when parity.npz is missing
+        np.savez(os.path.join(self.directory, 'parity.npz'), embeddings=np.eye(2, dtype=np.float32))
+        torch_module = types.ModuleType('sentence_transformers')
+        torch_module.SentenceTransformer = lambda name: FakeEncoder()
+        patch = mock.patch.dict(sys.modules, {'sentence_transformers': torch_module})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def onnx_encoder(self, min_cosine):
+        encoder = mock.Mock(precision='int8', threads=1)
+        encoder.check_parity.return_value = {'min_cosine': min_cosine,
+                                             'min_required': encoders.PARITY_MIN_COSINE['int8']}
+        return mock.patch('encoders.OnnxSentenceEncoder', return_value=encoder)
+
+    def test_parity_report_of_identical_embeddings(self):
+        embeddings = np.random.default_rng(3).standard_normal((4, DIMENSIONS))
+        report = encoders.parity_report(embeddings, embeddings.copy())
+        self.assertEqual(report['sentences'], 4)
+        self.assertAlmostEqual(report['min_cosine'], 1.0, places=5)
+        self.assertEqual(report['max_abs_diff'], 0.0)
+
+        report = encoders.parity_report(embeddings, -embeddings)
+        self.assertAlmostEqual(report['min_cosine'], -1.0, places=5)
+
+    def test_encoder_that_passes_parity_is_used(self):
+        with self.onnx_encoder(0.999):
+            encoder, info = encoders.load_encoder('onnx', self.directory)
+        self.assertEqual(info['backend'], 'onnx')
+        self.assertEqual(info['parity']['min_cosine'], 0.999)
+
+    def test_encoder_that_fails_parity_falls_back_to_pytorch(self):
+        with self.onnx_encoder(0.5):
+            encoder, info = encoders.load_encoder('onnx', self.directory)
+        self.assertEqual(info, {'backend': 'torch'})
+        self.assertIsInstance(encoder, FakeEncoder)
+
+    def test_missing_onnx_packages_fall_back_to_pytorch(self):
+        with mock.patch('encoders.OnnxSentenceEncoder', side_effect=ImportError('onnxruntime')):
+            encoder, info = encoders.load_encoder('onnx', self.directory)
+        self.assertEqual(info, {'backend': 'torch'})
+
+class IncrementalIngestionTest(RetrievalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pdf_directory = os.path.join(self.directory, 'guidelines')
+        os.makedirs(self.pdf_directory)
+        self.write('nice_stress.pdf', b'stress v1')
+        self.write('who_burnout.pdf', b'burnout v1')
+
+        self.kb = self.knowledge_base()
+        self.ingested = []
+        # PDF parsing and embedding are replaced by a record of the files handed to them
+        for patch in (mock.patch('clinical_ai.clinical_kb', self.kb),
+                      mock.patch.object(self.kb, 'delete_guidelines'),
+                      mock.patch('clinical_ai._ingest_documents', side_effect=self.record_ingest)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def record_ingest(self, documents, batch_size=None, workers=None):
+        self.ingested.append(sorted(os.path.basename(path) for path, _ in documents))
+        return len(documents)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.pdf_directory, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def load(self):
+        self.ingested.clear()
+        self.kb.delete_guidelines.reset_mock()
+        clinical_ai.load_pdf_guidelines(self.pdf_directory, workers=1)
+        return self.ingested[0] if self.ingested else []
+
+    def test_first_run_ingests_every_pdf(self):
+        self.assertEqual(self.load(), ['nice_stress.pdf', 'who_burnout.pdf'])
+        # Sections from before the manifest existed are replaced by source name
+        self.kb.delete_guidelines.assert_any_call({'source': 'Nice Stress'})
+        self.assertEqual(set(clinical_ai.load_ingest_manifest(self.kb.manifest_path())),
+                         {'nice_stress.pdf', 'who_burnout.pdf'})
+
+    def test_unchanged_pdfs_are_skipped(self):
+        self.load()
+        self.assertEqual(self.load(), [])
+        self.kb.delete_guidelines.assert_not_called()
+
+    def test_touched_pdf_with_the_same_content_is_skipped(self):
+        self.load()
+        self.write('nice_stress.pdf', b'stress v1', mtime=1_000_000_000)
+
+        self.assertEqual(self.load(), [])
+        self.kb.delete_guidelines.assert_not_called()
+        entry = clinical_ai.load_ingest_manifest(self.kb.manifest_path())['nice_stress.pdf']
+        self.assertEqual(entry['mtime'], 1_000_000_000)
+
+    def test_changed_pdf_replaces_only_its_own_sections(self):
+        self.load()
+        self.write('nice_stress.pdf', b'stress v2 with a new chapter', mtime=1_000_000_000)
+
+        self.assertEqual(self.load(), ['nice_stress.pdf'])
+        self.kb.delete_guidelines.assert_called_once_with({'source_file': 'nice_stress.pdf'})
+
+    def test_removed_pdf_has_its_sections_deleted(self):
+        self.load()
+        os.remove(os.path.join(self.pdf_directory, 'who_burnout.pdf'))
+
+        self.assertEqual(self.load(), [])
+        self.kb.delete_guidelines.assert_called_once_with({'source_file': 'who_burnout.pdf'})
+        self.assertEqual(set(clinical_ai.load_ingest_manifest(self.kb.manifest_path())), {'nice_stress.pdf'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,375 @@
+"""
+In-process vector index for Bloom Clinical AI
+Keeps normalized guideline embeddings in one memory-mapped NumPy matrix so
+gunicorn workers share the pages, and answers top-k with a single matmul
+"""
+
+import os
+import json
+import time
+import hashlib
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Metadata fields stored as parallel arrays; strings are dictionary-encoded
+STRING_FIELDS = ('source', 'topic', 'evidence_level', 'citation', 'source_file')
+INT_FIELDS = ('page_number',)
+
+# Rows scored per block when the matrix is not float32
+SCORE_BLOCK_ROWS = 4096
+
+# Storage modes: float32 scans the full matrix, float16/int8 scan a quantized copy
+QUANTIZED_DTYPES = ('float16', 'int8')
+
+# Quantized candidates rescored in full precision, per requested result
+DEFAULT_RESCORE_FACTOR = 4
+
+class NumpyVectorIndex:
+    """Exact inner-product search over a memory-mapped embedding matrix
+
+    Files in the index directory:
+      vectors.npy    - (n, dim) normalized float32 embeddings
+      quantized.npy  - float16 or int8 copy scanned for candidates (quantized modes)
+      scales.npy     - per-row dequantization scale (int8 only)
+      documents.json - guideline text, one entry per row
+      metadata.npz   - parallel metadata arrays (codes + vocabularies)
+      index.json     - dtype, dimensions, row count, ID fingerprint and build time
+
+    In quantized modes only the small matrix is scanned; the float32 rows of
+    the best candidates are read back from the memory map and rescored, so
+    the full-precision pages a worker keeps resident are the ones it hits.
+
+    Indexes are rebuilt into a fresh directory and swapped in with a rename,
+    so readers in other processes pick up a new version on their next query.
+    """
+
+    def __init__(self, path: str, dtype: str = 'float32', rescore_factor: int = DEFAULT_RESCORE_FACTOR):
+        if dtype not in ('float32',) + QUANTIZED_DTYPES:
+            raise ValueError(f"Unsupported vector index dtype: {dtype}")
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rescore_factor = max(1, rescore_factor)
+        self.vectors = None
+        self.quantized = None
+        self.scales = None
+        self.documents = []
+        self.metadata = {}
+        self.info = {}
+        self._version = None
+
+    # ---------- building ----------
+
+    def build(self, embeddings, documents: List[str], metadatas: List[Dict], ids: Optional[List[str]] = None) -> int:
+        """Write a new index version from embeddings, documents and metadata
+
+        The guideline IDs, when given, are stored as a fingerprint that
+        is_current() compares against the collection.
+        """
+        start = time.perf_counter()
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            # An empty collection still gets a (0, 0) matrix so it maps and searches
+            matrix = matrix.reshape(len(documents), -1) if len(documents) else np.zeros((0, 0), dtype=np.float32)
+
+        # Normalize so inner product equals cosine similarity
+        matrix = normalize_rows(matrix)
+
+        staging = f"{self.path}.building-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        np.save(os.path.join(staging, 'vectors.npy'), matrix)
+        if self.dtype == np.int8:
+            quantized, scales = quantize_int8(matrix)
+            np.save(os.path.join(staging, 'quantized.npy'), quantized)
+            np.save(os.path.join(staging, 'scales.npy'), scales)
+        elif self.dtype == np.float16:
+            np.save(os.path.join(staging, 'quantized.npy'), matrix.astype(np.float16))
+
+        with open(os.path.join(staging, 'documents.json'), 'w', encoding='utf-8') as f:
+            json.dump(list(documents), f)
+
+        arrays = {}
+        for field in STRING_FIELDS:
+            values = [str(metadata.get(field, '')) for metadata in metadatas]
+            vocabulary, codes = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+            arrays[f'{field}__vocab'] = vocabulary
+            arrays[f'{field}__codes'] = codes.astype(np.int32)
+        for field in INT_FIELDS:
+            arrays[field] = np.array([int(metadata.get(field, 0) or 0) for metadata in metadatas], dtype=np.int32)
+        np.savez(os.path.join(staging, 'metadata.npz'), **arrays)
+
+        with open(os.path.join(staging, 'index.json'), 'w') as f:
+            json.dump({
+                'dtype': self.dtype.name,
+                'count': int(matrix.shape[0]),
+                'fingerprint': ids_fingerprint(ids) if ids is not None else None,
+                'dimensions': int(matrix.shape[1]) if matrix.shape[0] else 0,
+                'built_at': time.time()
+            }, f)
+
+        # Swap directories; the old version is removed once the new one is in place
+        previous = f"{self.path}.previous-{os.getpid()}"
+        if os.path.exists(self.path):
+            os.rename(self.path, previous)
+        os.rename(staging, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        self._version = None
+        self.load()
+        print(f"🧮 Built vector index with {matrix.shape[0]} rows in {time.perf_counter() - start:.2f}s")
+        return int(matrix.shape[0])
+
+    def build_from_collection(self, collection) -> int:
+        """Export every embedding from a ChromaDB collection into the index"""
+        data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+        embeddings = data['embeddings'] if data['embeddings'] is not None else []
+        return self.build(embeddings, data['documents'] or [], data['metadatas'] or [], ids=data['ids'])
+
+    # ---------- loading ----------
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, 'index.json'))
+
+    def current_version(self):
+        """Modification time of index.json, which changes with every rebuild; None if missing"""
+        try:
+            return os.stat(os.path.join(self.path, 'index.json')).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> bool:
+        """Map the current index version if it changed since the last load"""
+        version = self.current_version()
+        if version is None:
+            # Missing, or mid-swap in another process: keep serving what is mapped
+            return self.vectors is not None
+        if version == self._version:
+            return True
+
+        with open(os.path.join(self.path, 'index.json')) as f:
+            info = json.load(f)
+        with open(os.path.join(self.path, 'documents.json'), encoding='utf-8') as f:
+            documents = json.load(f)
+        with np.load(os.path.join(self.path, 'metadata.npz'), allow_pickle=False) as arrays:
+            metadata = {name: arrays[name] for name in arrays.files}
+
+        # mmap_mode='r' shares the pages between every worker process
+        self.vectors = np.load(os.path.join(self.path, 'vectors.npy'), mmap_mode='r')
+        quantized_path = os.path.join(self.path, 'quantized.npy')
+        scales_path = os.path.join(self.path, 'scales.npy')
+        self.quantized = np.load(quantized_path, mmap_mode='r') if os.path.exists(quantized_path) else None
+        self.scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        self.documents = documents
+        self.metadata = metadata
+        self.info = info
+        self._version = version
+        return True
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else int(self.vectors.shape[0])
+
+    # ---------- searching ----------
+
+    def is_current(self, fingerprint: str) -> bool:
+        """Whether the mapped index holds the collection's guideline IDs in the configured storage mode
+
+        Guideline IDs are content hashes, so replacing sections without
+        changing their number still changes the fingerprint.
+        """
+        return self.info.get('fingerprint') == fingerprint and self.info.get('dtype') == self.dtype.name
+
+    def scores(self, queries: np.ndarray, full_precision: bool = False) -> np.ndarray:
+        """Inner products between every row and each query: (n, m)
+
+        Uses the quantized matrix when there is one, unless full_precision
+        is set; the int8 codes are dequantized block by block.
+        """
+        matrix = self.vectors if full_precision or self.quantized is None else self.quantized
+        if matrix.dtype == np.float32:
+            return matrix @ queries.T
+
+        out = np.empty((len(self), queries.shape[0]), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            out[start:start + len(block)] = block @ queries.T
+        if matrix.dtype == np.int8:
+            out *= self.scales[:, None]
+        return out
+
+    def top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Row indices of the k best scores in each column, best first"""
+        k = min(k, scores.shape[0])
+        if k == scores.shape[0]:
+            candidates = np.tile(np.arange(k), (scores.shape[1], 1))
+        else:
+            candidates = np.argpartition(-scores, k - 1, axis=0)[:k].T
+        order = np.take_along_axis(scores.T, candidates, axis=1).argsort(axis=1)[:, ::-1]
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def rank(self, queries: np.ndarray, n_results: int, rescore: bool = True):
+        """Best rows and their inner products for each normalized query
+
+        Quantized indexes take rescore_factor * n_results candidates from
+        the quantized scan and order them by their float32 scores.
+        """
+        scores = self.scores(queries)
+        if self.quantized is None or not rescore:
+            return [(rows, scores[rows, q]) for q, rows in enumerate(self.top_k(scores, n_results))]
+
+        ranked = []
+        for q, candidates in enumerate(self.top_k(scores, n_results * self.rescore_factor)):
+            candidates = np.sort(candidates)
+            exact = np.asarray(self.vectors[candidates]) @ queries[q]
+            order = np.argsort(-exact)[:n_results]
+            ranked.append((candidates[order], exact[order]))
+        return ranked
+
+    def search(self, queries, n_results: int) -> List[List[Dict]]:
+        """Top-k guidelines for each query embedding, shaped like ChromaDB results"""
+        self.load()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not len(self) or n_results <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        queries = normalize_rows(queries)
+
+        results = []
+        for rows, scores in self.rank(queries, n_results):
+            results.append([{
+                'content': self.documents[row],
+                'metadata': self.row_metadata(row),
+                # Same scale as the ChromaDB path: 1 - squared L2 distance of unit vectors
+                'relevance_score': float(1 - (2 - 2 * score))
+            } for row, score in zip(rows, scores)])
+        return results
+
+    def recall_at_k(self, queries, k: int) -> Dict:
+        """Share of the exact float32 top-k the quantized scan finds, before and after rescoring"""
+        self.load()
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if not len(self) or k <= 0:
+            return {'k': k, 'recall': None, 'recall_rescored': None}
+
+        exact = self.top_k(self.scores(queries, full_precision=True), k)
+
+        def recall(ranked):
+            found = [len(set(rows.tolist()) & set(truth.tolist())) / len(truth)
+                     for (rows, _), truth in zip(ranked, exact)]
+            return round(sum(found) / len(found), 4)
+
+        return {
+            'k': k,
+            'recall': recall(self.rank(queries, k, rescore=False)),
+            'recall_rescored': recall(self.rank(queries, k))
+        }
+
+    def row_metadata(self, row: int) -> Dict:
+        """Rebuild the metadata dictionary of one row from the parallel arrays"""
+        metadata = {}
+        for field in STRING_FIELDS:
+            metadata[field] = str(self.metadata[f'{field}__vocab'][self.metadata[f'{field}__codes'][row]])
+        for field in INT_FIELDS:
+            metadata[field] = int(self.metadata[field][row])
+        return metadata
+
+    def stats(self) -> Dict:
+        """Size of the mapped index and memory scanned per query"""
+        if self.vectors is None:
+            return {'rows': 0, 'dtype': self.dtype.name, 'scan_bytes': 0, 'full_precision_bytes': 0}
+
+        full_bytes = int(self.vectors.nbytes)
+        scan_bytes = full_bytes
+        if self.quantized is not None:
+            scan_bytes = int(self.quantized.nbytes) + (0 if self.scales is None else int(self.scales.nbytes))
+        return {
+            'rows': len(self),
+            'dtype': self.info.get('dtype', self.dtype.name),
+            'rescore_factor': self.rescore_factor if self.quantized is not None else None,
+            'scan_bytes': scan_bytes,
+            'full_precision_bytes': full_bytes,
+            'memory_saved_pct': round(100 * (1 - scan_bytes / full_bytes), 1) if full_bytes else 0.0
+        }
+
+def ids_fingerprint(ids: List[str]) -> str:
+    """SHA-256 of the sorted guideline IDs, independent of collection order"""
+    digest = hashlib.sha256()
+    for guideline_id in sorted(ids):
+        digest.update(guideline_id.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so inner product equals cosine similarity"""
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def quantize_int8(matrix: np.ndarray):
+    """Symmetric int8 codes with one float32 scale per row"""
+    scales = np.abs(matrix).max(axis=1, initial=0.0) / 127.0
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+def compare_quantization(collection, queries, path: str, k: int = 3,
+                         rescore_factor: int = DEFAULT_RESCORE_FACTOR) -> List[Dict]:
+    """Memory scanned and recall@k of each storage mode, built from one collection
+
+    Builds a throwaway index per mode under path, so it does not touch the
+    index the app serves from.
+    """
+    data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+    embeddings = data['embeddings'] if data['embeddings'] is not None else []
+
+    report = []
+    try:
+        for dtype in ('float32',) + QUANTIZED_DTYPES:
+            index = NumpyVectorIndex(os.path.join(path, dtype), dtype=dtype, rescore_factor=rescore_factor)
+            index.build(embeddings, data['documents'] or [], data['metadatas'] or [])
+            report.append(dict(index.stats(), **index.recall_at_k(queries, k)))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return report
+
+def benchmark_backends(kb, queries: List[str], n_results: int = 3, repeats: int = 20) -> Optional[Dict]:
+    """Compare query latency and top-k agreement of the ChromaDB and NumPy paths"""
+    if kb.collection is None or kb.vector_index is None or not len(kb.vector_index):
+        return None
+
+    embeddings = kb.encode_queries(queries)
+    matrix = np.vstack(embeddings).astype(np.float32)
+
+    def timed(search):
+        latencies = []
+        for _ in range(repeats):
+            for i in range(len(queries)):
+                start = time.perf_counter()
+                search(i)
+                latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return {
+            'p50_ms': round(latencies[len(latencies) // 2], 3),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3)
+        }
+
+    chroma = timed(lambda i: kb.collection.query(query_embeddings=[embeddings[i].tolist()], n_results=n_results))
+    numpy_index = timed(lambda i: kb.vector_index.search(matrix[i:i + 1], n_results))
+
+    # Agreement of the returned documents between the two backends
+    overlap = []
+    for i in range(len(queries)):
+        chroma_docs = kb.collection.query(query_embeddings=[embeddings[i].tolist()], n_results=n_results)['documents'][0]
+        numpy_docs = [r['content'] for r in kb.vector_index.search(matrix[i:i + 1], n_results)[0]]
+        overlap.append(len(set(chroma_docs) & set(numpy_docs)) / max(1, len(chroma_docs)))
+
+    return {
+        'rows': len(kb.vector_index),
+        'queries': len(queries),
+        'n_results': n_results,
+        'chroma': chroma,
+        'numpy': numpy_index,
+        'speedup_p50': round(chroma['p50_ms'] / numpy_index['p50_ms'], 1) if numpy_index['p50_ms'] else None,
+        'top_k_overlap': round(sum(overlap) / len(overlap), 3)
+    }